@@ -0,0 +1,271 @@
+"""Monte Carlo balancing runs for the spawn and speed parameters.
+
+Plays many headless sessions with a bot at every point of a parameter grid
+and prints distance/points/lives distributions plus how often a due spawn
+found no free lane and had to wait for a later row, as JSON:
+
+    python balance.py --grid ob_period=2.5,3.5,4.5 --grid coin_double_prob=0.1,0.25 \\
+        --sessions 2000 --out balance.json
+
+Any numeric module setting in engine.py can be swept (coin_period,
+coin_line, ob_period, mg_period, coin_double_prob, min_y_gap, base_speed,
+max_speed, speed_ramp, speed_ramp_gain, ...).  Sessions are split into
+chunks and spread over a process pool; every worker plays its own
+GameSession, so throughput grows with the number of cores.  Only the
+engine is imported: no window, GL context or PyOpenGL is needed.
+
+--search TICKS swaps the rule-based bot for one that tries its moves out
+on snapshots of the game state (see gamestate.py); it plays better and
+much slower.
+
+Session k at every grid point uses seed --seed + k, so grid points are
+compared on the same spawn streams.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import engine
+
+SPAWNERS = {'emit_coin': 'coin', 'emit_obstacles': 'obstacle', 'emit_magnet': 'magnet'}
+
+session = None                   # the GameSession each worker process plays
+defaults = {}                    # engine settings before any grid point was applied
+counters = {}
+
+
+class Bot:
+    """Dodges obstacles ahead in its lane and drifts toward coins.
+
+    It looks `lookahead` ticks ahead at the current speed and, with
+    probability `slip`, misses its chance to react on a given tick.
+    """
+
+    def __init__(self, lookahead=45, slip=0.02):
+        self.lookahead = lookahead
+        self.slip = slip
+
+    def lane_clear(self, store, x, reach):
+        n = store.n
+        y = session.runner_forward
+        ahead = (store.x[:n] == x) & (store.y[:n] > y - engine.hit_radius) & (store.y[:n] < y + reach)
+        return not ahead.any()
+
+    def coins_in(self, x, reach):
+        c = session.coins
+        n = c.n
+        y = session.runner_forward
+        return int(np.count_nonzero((c.x[:n] == x) & (c.y[:n] > y) & (c.y[:n] < y + reach)))
+
+    def act(self, rng):
+        st = session
+        if abs(st.runner_side - st.runner_side_goal) >= 5 or rng.random() < self.slip:
+            return                             # mid-switch, or asleep this tick
+        reach = st.game_speed * self.lookahead + engine.hit_radius
+        lane = st.lane_idx
+        here = engine.LANE_X[lane]
+        options = [i for i in (lane - 1, lane + 1) if 0 <= i < len(engine.LANE_X)
+                   and self.lane_clear(st.obstacles, engine.LANE_X[i], reach)]
+        if self.lane_clear(st.obstacles, here, reach):
+            # safe: only move for coins
+            options = [i for i in options if self.coins_in(engine.LANE_X[i], reach) > self.coins_in(here, reach)]
+            if not options:
+                return
+        elif not options:
+            return                             # boxed in
+        target = max(options, key=lambda i: self.coins_in(engine.LANE_X[i], reach))
+        st.switch_lane(-1 if target < lane else 1)
+
+
+class SearchBot:
+    """Plays by trying its moves out on a copy of the game.
+
+    Every `every` ticks it snapshots the state, plays `horizon` ticks after
+    staying put, moving left and moving right, rewinds after each, and
+    makes the move whose future went best (still running, then lives,
+    then points).  Like Bot it sometimes misses a decision (`slip`).
+    """
+
+    MOVES = (0, -1, 1)                      # lane changes
+
+    def __init__(self, horizon=200, every=15, slip=0.02):
+        self.horizon = horizon
+        self.every = every
+        self.slip = slip
+
+    def act(self, rng):
+        st = session
+        if st.tick_no % self.every or abs(st.runner_side - st.runner_side_goal) >= 5 \
+                or rng.random() < self.slip:
+            return
+        snap = st.snapshot()
+        spawns = dict(counters)                # look-ahead spawns don't count
+        best = best_move = None
+        for move in self.MOVES:
+            if move:
+                st.switch_lane(move)
+            for _ in range(self.horizon):
+                if not st.is_running:
+                    break
+                st.step(engine.TICK)
+            outcome = (st.is_running, st.lives, st.points)
+            st.restore(snap)
+            counters.update(spawns)
+            if best is None or outcome > best:
+                best, best_move = outcome, move
+        if best_move:
+            st.switch_lane(best_move)
+
+
+def _count_emit(fn, kind):
+    def emit(self, row_y):
+        placed = fn(self, row_y)
+        counters[kind + '_emits'] += 1
+        if not placed:
+            counters[kind + '_deferred'] += 1
+        return placed
+    return emit
+
+
+def init_worker():
+    global session
+    if session is not None:
+        return                               # forked from a process that has one
+    session = engine.GameSession()
+    defaults.update(engine.settings())
+    for name, kind in SPAWNERS.items():
+        setattr(engine.GameSession, name, _count_emit(getattr(engine.GameSession, name), kind))
+
+
+def play_chunk(params, seeds, ticks, lookahead, slip, search=0):
+    """Play one session per seed with `params` applied; raw per-session results."""
+    for name, value in defaults.items():
+        setattr(engine, name, value)
+    for name, value in params.items():
+        setattr(engine, name, value)
+    counters.clear()
+    for kind in SPAWNERS.values():
+        for c in ('emits', 'deferred'):
+            counters[f'{kind}_{c}'] = 0
+
+    bot = SearchBot(search, slip=slip) if search else Bot(lookahead, slip)
+    rows = []
+    for seed in seeds:
+        session.reset(seed)
+        rng = random.Random(f"{seed}:bot")
+        n = 0
+        while n < ticks and session.is_running:
+            bot.act(rng)
+            session.step(engine.TICK)
+            n += 1
+        st = session
+        rows.append((st.meters, st.points, st.lives, n, not st.is_running))
+    return rows, dict(counters)
+
+
+def percentiles(values):
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {'mean': float(values.mean()), 'p10': float(p10), 'p50': float(p50), 'p90': float(p90)}
+
+
+def summarise(params, rows, counts):
+    meters, points, lives, ticks, over = (np.array(c) for c in zip(*rows))
+    spawn = {}
+    for kind in SPAWNERS.values():
+        emits, deferred = counts[f'{kind}_emits'], counts[f'{kind}_deferred']
+        spawn[kind] = {
+            'placed': emits - deferred,
+            'deferral_rate': deferred / emits if emits else 0.0,
+        }
+    return {
+        'params': params,
+        'sessions': len(rows),
+        'game_over_rate': float(over.mean()),
+        'ticks_mean': float(ticks.mean()),
+        'meters': percentiles(meters),
+        'points': percentiles(points),
+        'lives_left': {str(k): int(v) for k, v in enumerate(np.bincount(lives, minlength=6))},
+        'spawn': spawn,
+    }
+
+
+def parse_grid(specs):
+    """['name=1,2', ...] -> list of {name: value} dicts (the cartesian product)."""
+    names, values = [], []
+    for spec in specs:
+        name, sep, vals = spec.partition('=')
+        if not sep or not vals:
+            raise SystemExit(f"bad --grid {spec!r}: expected name=v1,v2,...")
+        names.append(name.strip())
+        values.append([float(v) if '.' in v or 'e' in v else int(v) for v in vals.split(',')])
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help='setting to sweep (repeatable; the grid is their product)')
+    parser.add_argument('--sessions', type=int, default=1000, help='sessions per grid point')
+    parser.add_argument('--ticks', type=int, default=20000,
+                        help='cap per session (%(default)s ticks = 320 s of play)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk', type=int, default=25, help='sessions per worker task')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--lookahead', type=int, default=45, help='bot lookahead in ticks')
+    parser.add_argument('--search', type=int, default=0, metavar='TICKS',
+                        help='use the look-ahead bot, searching this many ticks ahead')
+    parser.add_argument('--slip', type=float, default=0.02,
+                        help='chance per tick that the bot fails to react')
+    parser.add_argument('--out', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    init_worker()                            # validates names in this process too
+    for name in {n for point in grid for n in point}:
+        if name not in defaults:
+            raise SystemExit(f"--grid {name}: not a numeric setting in engine.py")
+
+    seeds = [args.seed + k for k in range(args.sessions)]
+    chunks = [seeds[i:i + args.chunk] for i in range(0, len(seeds), args.chunk)]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [[pool.submit(play_chunk, point, chunk, args.ticks, args.lookahead, args.slip,
+                                args.search)
+                    for chunk in chunks] for point in grid]
+        results = []
+        for point, point_futures in zip(grid, futures):
+            rows, counts = [], {}
+            for f in point_futures:
+                chunk_rows, chunk_counts = f.result()
+                rows += chunk_rows
+                for k, v in chunk_counts.items():
+                    counts[k] = counts.get(k, 0) + v
+            results.append(summarise(point, rows, counts))
+    took = time.perf_counter() - t0
+
+    report = {
+        'sessions_per_point': args.sessions,
+        'max_ticks': args.ticks,
+        'bot': ({'search': args.search, 'slip': args.slip} if args.search
+                else {'lookahead': args.lookahead, 'slip': args.slip}),
+        'workers': args.workers,
+        'seconds': round(took, 2),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
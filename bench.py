@@ -0,0 +1,251 @@
+"""Offscreen rendering benchmark for the runner.
+
+Creates a headless GL context through PyOpenGL's EGL or OSMesa platform,
+plays scripted scenarios for a fixed number of frames (one simulation tick
+and one full render each) and prints the results as JSON:
+
+    python bench.py --platform egl --frames 300 --out bench.json
+    python bench.py --baseline bench.json --max-regression 0.15
+
+With --baseline the exit status is 1 if any scenario's ms/frame got worse
+than the baseline by more than --max-regression.
+
+The HUD is not drawn: GLUT bitmap fonts need a GLUT window.
+"""
+import argparse
+import ctypes
+import json
+import os
+import random
+import sys
+import time
+
+import engine
+
+WIDTH, HEIGHT = 1000, 800
+
+
+def make_context(platform):
+    """Create and bind an offscreen context; must run before the game imports GL."""
+    os.environ['PYOPENGL_PLATFORM'] = platform
+    if platform == 'egl':
+        # Mesa needs a display-less EGL platform on machines without X/Wayland
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+        from OpenGL import EGL
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(display, None, None):
+            raise RuntimeError("eglInitialize failed")
+        attrs = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                 EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+                 EGL.EGL_DEPTH_SIZE, 24,
+                 EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                 EGL.EGL_NONE]
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(display, (EGL.EGLint * len(attrs))(*attrs),
+                            ctypes.pointer(config), 1, ctypes.pointer(count))
+        if not count.value:
+            raise RuntimeError("no EGL config with a pbuffer and depth buffer")
+        size = [EGL.EGL_WIDTH, WIDTH, EGL.EGL_HEIGHT, HEIGHT, EGL.EGL_NONE]
+        surface = EGL.eglCreatePbufferSurface(display, config, (EGL.EGLint * len(size))(*size))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+        if not EGL.eglMakeCurrent(display, surface, surface, context):
+            raise RuntimeError("eglMakeCurrent failed")
+        return (display, surface, context)
+    elif platform == 'osmesa':
+        from OpenGL import GL, osmesa
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not context:
+            raise RuntimeError("OSMesaCreateContextExt failed")
+        buffer = (GL.GLubyte * (WIDTH * HEIGHT * 4))()
+        if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, WIDTH, HEIGHT):
+            raise RuntimeError("OSMesaMakeCurrent failed")
+        return (context, buffer)
+    raise ValueError(f"unknown platform {platform!r}")
+
+
+# Scenarios: setup(game, rng) runs once after reset_game(seed); per_frame(game, rng)
+# runs before every tick to hold the workload steady.  Settings a setup changes
+# in engine are put back after its scenario.
+
+def keep_alive(game):
+    # benchmarks measure rendering, not how long the bot survives
+    game.session.is_running = True
+    game.session.lives = 5
+
+
+def setup_empty(game, rng):
+    engine.coin_period = engine.ob_period = engine.mg_period = float('inf')
+    # reset_game already laid out the chunks in view
+    for store in (game.session.coins, game.session.obstacles, game.session.magnets):
+        store.clear()
+
+
+def frame_empty(game, rng):
+    keep_alive(game)
+
+
+def setup_coins_magnet(game, rng):
+    setup_empty(game, rng)
+    game.session.mag_on = True
+    game.session.mag_time_left = 1e9
+
+
+def frame_coins_magnet(game, rng):
+    keep_alive(game)
+    while game.session.coins.n < 200:
+        lane = rng.choice(engine.LANE_X)
+        game.session.coins.add(lane, game.session.runner_forward + rng.uniform(100, 1400), 20,
+                               engine.COIN_DOUBLE if rng.random() < 0.25 else engine.COIN_NORMAL)
+
+
+def setup_max_speed(game, rng):
+    # the speed ramp tops out long before this much simulated time
+    game.session.sim_time = 1e4
+
+
+def frame_max_speed(game, rng):
+    keep_alive(game)
+
+
+def setup_daynight(game, rng):
+    engine.coin_period = 0.5
+
+
+def frame_daynight(game, rng):
+    keep_alive(game)
+    if not game.session.is_transitioning:
+        game.session.is_transitioning = True
+        game.session.trans_dir = -1 if game.session.is_day else 1
+
+
+SCENARIOS = {
+    'empty_track': (setup_empty, frame_empty),
+    'coins_200_magnet': (setup_coins_magnet, frame_coins_magnet),
+    'max_speed': (setup_max_speed, frame_max_speed),
+    'day_night': (setup_daynight, frame_daynight),
+}
+
+
+def run_scenario(game, name, frames, warmup, seed, count_frames):
+    settings = engine.settings()
+    try:
+        return _run_scenario(game, name, frames, warmup, seed, count_frames)
+    finally:
+        for k, v in settings.items():
+            setattr(engine, k, v)
+
+
+def _run_scenario(game, name, frames, warmup, seed, count_frames):
+    from OpenGL.GL import glFinish
+
+    setup, per_frame = SCENARIOS[name]
+    rng = random.Random(seed)
+    game.reset_game(seed)
+    setup(game, rng)
+
+    def one_frame():
+        per_frame(game, rng)
+        game.session.step(engine.TICK)
+        game.render_frame(hud=False)
+        glFinish()
+
+    for _ in range(warmup):
+        one_frame()
+
+    times = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        one_frame()
+        times.append(time.perf_counter() - t0)
+
+    # count GL calls in a separate pass so the wrappers don't skew timing
+    mods = [sys.modules[m] for m in ('project', 'instancing', 'runner_model', 'meshcache',
+                                     'renderqueue', 'hudlayer')]
+    game.profiler.reset()
+    game.profiler.enable((game, engine.GameSession), mods)
+    game.profiler.next_frame()
+    for _ in range(count_frames):
+        one_frame()
+        game.profiler.next_frame()
+    stats = game.profiler.stats()
+    counters = game.profiler.counter_stats()
+    game.profiler.disable()
+    game.profiler.reset()
+
+    times.sort()
+    total = sum(times)
+    return {
+        'frames': frames,
+        'fps': frames / total,
+        'ms_per_frame': total / frames * 1000,
+        'ms_p99': times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+        'gl_calls_per_frame': stats['frame'][3],
+        'visible_per_frame': counters['visible'],
+        'culled_per_frame': counters['culled'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--platform', choices=('egl', 'osmesa'),
+                        default=os.environ.get('PYOPENGL_PLATFORM', 'egl'))
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--count-frames', type=int, default=30,
+                        help='frames used to count GL calls (after timing)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only these scenarios (repeatable)')
+    parser.add_argument('--lod-bias', type=float, default=1.0,
+                        help='level-of-detail bias (<1 = coarser meshes sooner)')
+    parser.add_argument('--out', help='also write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='allowed ms/frame increase over the baseline (fraction)')
+    args = parser.parse_args()
+
+    make_context(args.platform)
+    from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+    import project as game
+    game.lod_policy.bias = args.lod_bias
+
+    report = {
+        'platform': args.platform,
+        'renderer': glGetString(GL_RENDERER).decode(),
+        'gl_version': glGetString(GL_VERSION).decode(),
+        'lod_bias': args.lod_bias,
+        'scenarios': {},
+    }
+    for name in args.scenario or SCENARIOS:
+        report['scenarios'][name] = run_scenario(
+            game, name, args.frames, args.warmup, args.seed, args.count_frames)
+
+    game.release_gl()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)['scenarios']
+        failed = False
+        for name, res in report['scenarios'].items():
+            if name not in base:
+                continue
+            limit = base[name]['ms_per_frame'] * (1 + args.max_regression)
+            if res['ms_per_frame'] > limit:
+                print(f"REGRESSION {name}: {res['ms_per_frame']:.2f} ms/frame "
+                      f"(baseline {base[name]['ms_per_frame']:.2f}, limit {limit:.2f})",
+                      file=sys.stderr)
+                failed = True
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Streaming track chunks in a recycled ring.
+
+The track is cut into `length`-long chunks, numbered from `behind` before
+the start of the run.  A chunk is generated whole (its scenery and
+everything to pick up or dodge on it) once it comes within `ahead` of the
+runner, and its slot in the ring is reused for a new chunk once it has
+fallen `behind` the runner, so the ring never grows and generation cost is
+paid once per chunk instead of once per frame.
+
+ChunkRing only keeps the per-chunk scenery table and the bookkeeping; what
+goes into a chunk is up to the game.
+"""
+import numpy as np
+
+
+class ChunkRing:
+    """Scenery rows of the chunks in flight.
+
+    trees    (size, per_chunk, 4): x, world y, trunk height, crown radius
+    numbers  chunk number held by each slot, -1 while the slot is unused
+    ids      id of the chunk in each slot; unlike numbers these are never
+             reused, not even after clear(), so caches can key on them
+    """
+
+    def __init__(self, length, ahead, behind, trees_per_chunk):
+        self.length = length
+        self.ahead = ahead
+        self.origin = -behind            # where chunk 0 starts
+        # a chunk must be entirely behind before its slot comes round again
+        self.size = int((ahead + behind) // length) + 2
+        self.trees = np.zeros((self.size, trees_per_chunk, 4))
+        self.numbers = np.full(self.size, -1)
+        self.ids = np.full(self.size, -1)
+        self.next = 0                    # number of the next chunk to generate
+        self.next_id = 0
+
+    def clear(self):
+        self.numbers[:] = -1
+        self.next = 0
+
+    def due(self, scroll):
+        """True while the next chunk starts less than `ahead` past `scroll`."""
+        return self.start(self.next) < scroll + self.ahead
+
+    def start(self, number):
+        return self.origin + number * self.length
+
+    def claim(self):
+        """Recycle the oldest slot for the next chunk; (slot, start y)."""
+        number = self.next
+        slot = number % self.size
+        self.numbers[slot] = number
+        self.ids[slot] = self.next_id
+        self.next += 1
+        self.next_id += 1
+        return slot, self.start(number)
+
+    def snapshot(self):
+        return (self.trees.copy(), self.numbers.copy(), self.ids.copy(), self.next, self.next_id)
+
+    def restore(self, snap):
+        trees, numbers, ids, self.next, next_id = snap
+        # ids handed out since the snapshot stay used up
+        self.next_id = max(self.next_id, next_id)
+        self.trees[:] = trees
+        self.numbers[:] = numbers
+        self.ids[:] = ids
+
+    def live(self):
+        """Mask of slots that hold a chunk."""
+        return self.numbers >= 0
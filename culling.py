@@ -0,0 +1,58 @@
+"""View-frustum culling with bounding spheres.
+
+The camera matrices are rebuilt here the way gluPerspective and gluLookAt
+build them, so the frustum can be had without reading anything back from
+GL.  Frustum.visible() tests many spheres in one NumPy expression.
+"""
+import math
+
+import numpy as np
+
+
+def perspective(fovy, aspect, near, far):
+    """The gluPerspective matrix (row-major, column vectors)."""
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                     [0, 0, -1, 0]])
+
+
+def look_at(eye, target, up):
+    """The gluLookAt matrix (row-major, column vectors)."""
+    eye = np.asarray(eye, dtype=float)
+    f = np.asarray(target, dtype=float) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    m = np.identity(4)
+    m[0, :3], m[1, :3], m[2, :3] = s, u, -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+
+class Frustum:
+    """Six planes (a, b, c, d) with normals pointing into the view volume."""
+
+    def __init__(self, planes):
+        self.planes = planes
+
+    @classmethod
+    def from_matrix(cls, m):
+        # Gribb & Hartmann: each plane is the last row plus/minus another row
+        planes = np.array([m[3] + m[0], m[3] - m[0],      # left, right
+                           m[3] + m[1], m[3] - m[1],      # bottom, top
+                           m[3] + m[2], m[3] - m[2]])     # near, far
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+        return cls(planes)
+
+    @classmethod
+    def for_camera(cls, fovy, aspect, near, far, eye, target, up=(0, 0, 1)):
+        return cls.from_matrix(perspective(fovy, aspect, near, far) @ look_at(eye, target, up))
+
+    def visible(self, centres, radii):
+        """Bool mask: which spheres (centres (n, 3), radii scalar or (n,)) are
+        at least partly inside."""
+        dist = centres @ self.planes[:, :3].T + self.planes[:, 3]
+        return (dist >= -np.reshape(radii, (-1, 1))).all(axis=1)
@@ -0,0 +1,513 @@
+"""The runner's game engine: one GameSession per game, no window or GL.
+
+A GameSession is the whole game state (it is a GameState, so it can be
+snapshotted and restored) plus the logic that advances it: step() and the
+update_* passes, chunk generation and the emit_* spawners, and the game's
+reactions to input.  Sessions share nothing but the settings below, so one
+process can run any number of them side by side; balance.py and replay.py
+do exactly that without importing PyOpenGL.  project.py draws one session
+and feeds it GLUT input.
+
+The settings are module-level so tools can tune them (balance.py sweeps
+any lower-case number here).  Per-tick speeds are tuned for TICK-sized
+steps.
+"""
+import math
+import random
+from collections import deque
+
+import numpy as np
+
+from chunks import ChunkRing
+from entities import MagnetField
+from events import (EventBus, CoinCollected, LifeLost, GameOver, MagnetOn, MagnetOff,
+                    LaneSwitch, Notice)
+from gamestate import GameState
+from patterns import OB_PATTERNS, FREE_LANES, MASK_LANES
+
+# Simulation clock
+TICK = 0.016
+
+# Lanes, runner & movement
+LANE_W = 100
+LANE_X = [-LANE_W, 0, LANE_W]   # left/center/right X-positions
+
+# Animation pacing
+base_speed = 0.7
+max_speed = 4
+lane_interp_speed = 5
+speed_ramp = 15.0                # meters run per unit of speed gained
+speed_ramp_gain = 0.7            # share of that gain applied to game_speed
+
+# Runner animation (speeds up with distance)
+anim_base = 0.02
+anim_max = 0.05
+
+# Day/Night
+trans_step = 0.01
+
+# entity type codes stored in EntityStore.type
+COIN_NORMAL, COIN_DOUBLE = 0, 1
+OB_NORMAL, OB_LIFE = 0, 1
+COIN_KINDS = ("normal", "double")
+OB_KINDS = ("normal", "life")
+COIN_VALUES = np.array([1, 2])   # points per coin, indexed by type code
+
+#coins
+coin_period = 6.0                # seconds between coin lines
+coin_line = 3                    # coins per line
+COIN_SPACING = 120
+coin_pick_radius = 15
+coin_double_prob = 0.25
+
+#obstacles
+ob_period = 3.5
+hit_radius = 20
+min_y_gap = 800                  # nothing within this of an obstacle in its lane
+coin_gap = 100                   # nor of a coin
+mg_gap = 150                     # nor of a magnet
+
+#magnet
+mg_period = 25
+mag_seconds = 10
+mag_radius = 500
+mag_pick_radius = 15
+mag_pull = 15.0
+
+# Track chunks: everything on a CHUNK_LEN stretch of track (trees, coin
+# lines, obstacle rows, magnets) is generated in one go before it comes into
+# view, and dropped once it is behind the chase camera.  The *_due values
+# carry fractional spawns over from row to row.
+CHUNK_LEN = 600
+SLOT_LEN = 150                   # chunks are filled a row this long at a time
+TREE_STEP = 150
+TREE_X = LANE_W * 3 / 2 + 80
+TREES_PER_CHUNK = 2 * (CHUNK_LEN // TREE_STEP)
+SAFE_START = 500                 # nothing to collect or dodge before this
+SPAWN_AHEAD = 1500               # the camera's far plane
+SPAWN_BEHIND = 300               # how far the chase camera trails the runner
+
+# GLUT's codes for the keys the game reacts to (recorded input holds these)
+KEY_LEFT, KEY_UP, KEY_RIGHT, KEY_DOWN = 100, 101, 102, 103
+
+
+def settings():
+    """The settings tools may tune, name -> current value.
+
+    These are the module's lower-case plain numbers; balance.py sweeps
+    them and bench.py puts them back after each scenario.
+    """
+    return {name: value for name, value in globals().items()
+            if name[0].islower() and type(value) in (int, float)}
+
+
+class GameSession(GameState):
+    """One game.
+
+    Gameplay randomness comes only from the RNG streams, one per spawner
+    plus scenery, all seeded from game_seed, so nothing else (tools,
+    rendering) can shift what gets spawned.
+
+    bus          where this session's gameplay events go
+    input_log    input recorded since the last reset, or None
+    replay_queue recorded input still to be fed in (see replay.py)
+    view_input   called with recorded events that only change the view
+                 (camera height, first person), for whoever draws the game
+    """
+
+    __slots__ = ('bus', 'coin_field', 'input_log', 'replay_queue', 'view_input')
+
+    def __init__(self):
+        super().__init__(ChunkRing(CHUNK_LEN, SPAWN_AHEAD, SPAWN_BEHIND, TREES_PER_CHUNK))
+        self.bus = EventBus()
+        self.coin_field = MagnetField()      # the runner's magnet, acting on coins
+        self.coin_field.add(0, 0, 20, 0.0, 0.0, 0.0)    # placed by update_coins
+        self.input_log = None
+        self.replay_queue = deque()
+        self.view_input = None
+        self.tick_no = 0                     # a replay may start before any reset
+
+    def log(self, msg):
+        self.bus.emit(Notice(msg))
+
+    def reset(self, seed=None):
+        """Start a new game; the same seed and inputs play out the same way."""
+        # Reset player position to center lane
+        self.lane_idx = 1
+        self.runner_forward = 0
+        self.runner_side = LANE_X[self.lane_idx]
+        self.runner_side_goal = self.runner_side
+
+        # Reset movement and animation
+        self.track_scroll = 0
+        self.game_speed = base_speed
+        self.anim_curr = anim_base
+
+        # Reset game state
+        self.is_running = True
+        self.paused = False
+        self.score = 0
+        self.points = 0
+        self.meters = 0.0
+
+        # Reset timing
+        self.sim_time = 0.0
+        self.tick_no = 0
+        self.prev_runner_side = self.runner_side
+        self.prev_track_scroll = self.track_scroll
+        self.last_move = 0.0
+
+        # Clear all collectible items
+        self.coins.clear()
+        self.coin_due = 0.0
+
+        self.obstacles.clear()
+        self.recent_ob_lanes.clear()
+        self.ob_lane_use[:] = [0, 0, 0]
+        self.ob_last_row = 0
+        self.ob_last_y = -math.inf
+        self.ob_due = 0.0
+
+        self.lives = 5
+
+        # Reset power-ups
+        self.magnets.clear()
+        self.mg_due = 0.0
+        self.mag_on = False
+        self.mag_time_left = 0.0
+
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.game_seed = seed
+        self.coin_rng.seed(f"{seed}:coins")
+        self.ob_rng.seed(f"{seed}:obstacles")
+        self.mg_rng.seed(f"{seed}:magnets")
+        self.scenery_rng.seed(f"{seed}:scenery")
+        self.record_input('S', seed)
+
+        self.track_chunks.clear()
+        self.lane_occ.clear()
+        self.stream_chunks()
+
+    def step(self, dt=TICK):
+        """Advance the simulation by dt seconds.
+
+        This is the whole game update; it touches no GL state and never reads
+        the wall clock, so it can be driven headless (see run).
+        """
+
+        if not self.is_running:
+            return
+
+        self.prev_runner_side = self.runner_side
+        self.prev_track_scroll = self.track_scroll
+
+        # distance traveled (time-based)
+        self.sim_time += dt
+        self.meters = self.sim_time
+
+        # Smooth lane switching animation
+        diff = self.runner_side_goal - self.runner_side
+        if abs(diff) > 0.5:
+            self.runner_side += diff * min(1.0, 0.15 * dt / TICK)   # Interpolate to target position
+        else:
+            self.runner_side = self.runner_side_goal
+
+        # track scrolling effect
+        self.track_scroll += self.game_speed * dt / TICK
+
+        # Gradually increase game speed
+        speed_gain = min(self.meters / speed_ramp, max_speed - base_speed)
+        self.game_speed = base_speed + speed_gain * speed_ramp_gain
+
+        # Increase animation speed to match game speed
+        anim_gain = min(self.meters / 15.0, anim_max - anim_base)
+        self.anim_curr = anim_base + anim_gain * 0.7
+        self.last_move = self.game_speed * dt / TICK
+
+        # Update magnet power-up timer
+        if self.mag_on:
+            self.mag_time_left -= dt
+            if self.mag_time_left <= 0:
+                self.mag_on = False
+                self.mag_time_left = 0.0
+                self.bus.emit(MagnetOff())
+
+        self.score += 1
+        self.tick_no += 1
+
+        self.update_coins(dt)
+        self.update_obstacles(dt)
+        self.update_magnets(dt)
+        self.update_daynight(dt)
+        self.stream_chunks()
+
+    def update_daynight(self, dt=TICK):
+        step = trans_step * dt / TICK
+        if self.is_transitioning:
+            if self.trans_dir == 1:
+                self.bg_rgb[0] = min(0.5, self.bg_rgb[0] + step)
+                self.bg_rgb[1] = min(0.8, self.bg_rgb[1] + step * 2)
+                self.bg_rgb[2] = min(1.0, self.bg_rgb[2] + step * 3)
+                if self.bg_rgb[2] >= 1.0:
+                    self.is_day = True
+                    self.is_transitioning = False
+            elif self.trans_dir == -1:
+                self.bg_rgb[0] = max(0.05, self.bg_rgb[0] - step)
+                self.bg_rgb[1] = max(0.05, self.bg_rgb[1] - (step * 2))
+                self.bg_rgb[2] = max(0.08, self.bg_rgb[2] - (step * 2))
+                if self.bg_rgb[1] <= 0.05:
+                    self.is_day = False
+                    self.is_transitioning = False
+
+    def update_coins(self, dt=TICK):
+        if self.coins.n == 0:
+            return
+
+        # Move coins toward player, drop the ones behind the player and collect
+        # the ones it touches; with the magnet power-up it also pulls in every
+        # coin within mag_radius.
+        move, y_min = self.game_speed * dt / TICK, self.runner_forward - 50
+        if self.mag_on:
+            self.coins.sweep(move, y_min)
+            self.coin_field.set_field(0, self.runner_side, self.runner_forward, 20,
+                                      mag_radius, mag_pull * dt / TICK, coin_pick_radius)
+            got, gained = self.coin_field.solve(self.coins, COIN_VALUES)
+        else:
+            picked = self.coins.sweep(move, y_min, self.runner_side, self.runner_forward, 20,
+                                      coin_pick_radius)
+            got = len(picked)
+            gained = int(COIN_VALUES[self.coins.type[picked]].sum()) if got else 0
+            self.coins.kill(picked)
+        if got:
+            self.points += gained
+            self.bus.emit(CoinCollected(got, gained, self.points))
+
+        self.coins.compact()
+
+    def update_obstacles(self, dt=TICK):
+        if self.obstacles.n == 0:
+            return
+
+        # Move obstacles toward player, drop the ones behind and find the ones
+        # the player runs into
+        hit = self.obstacles.sweep(self.game_speed * dt / TICK, self.runner_forward - 50,
+                                   self.runner_side, self.runner_forward, 10, hit_radius)
+        if hit:
+            kinds = self.obstacles.type[hit].tolist()
+            boxes = [i for i, k in zip(hit, kinds) if k == OB_LIFE]
+            life_hits = len(boxes)
+            if life_hits:
+                # black boxes cost a life and disappear
+                self.lives = max(self.lives - life_hits, 0)
+                self.obstacles.kill(boxes)
+                self.bus.emit(LifeLost(self.lives))
+            if life_hits < len(kinds) or self.lives <= 0:
+                self.is_running = False
+                self.bus.emit(GameOver(self.points, self.meters))
+
+        self.obstacles.compact()
+
+    def update_magnets(self, dt=TICK):
+        if self.magnets.n == 0:
+            return
+
+        picked = self.magnets.sweep(self.game_speed * dt / TICK, self.runner_forward - 50,
+                                    self.runner_side, self.runner_forward, 20, mag_pick_radius)
+        got = len(picked)
+        if got:
+            self.magnets.kill(picked)
+            self.mag_on = True
+            self.mag_time_left += mag_seconds * got
+            self.bus.emit(MagnetOn(self.mag_time_left))
+
+        self.magnets.compact()
+
+    # Spawns are placed a row at a time in track coordinates (runner frame y +
+    # track_scroll).  lane_occ holds, per lane, where the last thing placed in
+    # it stops keeping other spawns out, so a row's free lanes are one mask.
+    def stream_chunks(self):
+        """Generate chunks until the track is filled out to SPAWN_AHEAD past the runner."""
+        while self.track_chunks.due(self.track_scroll):
+            self.generate_chunk()
+
+    def generate_chunk(self):
+        """Lay out the next chunk of track and recycle the oldest ring slot for it.
+
+        Trees line both sides every TREE_STEP.  Coin lines, obstacle rows and
+        magnets are placed a SLOT_LEN row at a time, at most one of each per row,
+        at the rates the *_period settings give at the current speed.  A spawn
+        that finds no free lane stays due for the next row.
+        """
+        slot, start = self.track_chunks.claim()
+        trees = self.track_chunks.trees[slot]
+        for i in range(TREES_PER_CHUNK // 2):
+            for j, side in enumerate((-1, 1)):
+                s = self.scenery_rng.uniform(0.8, 1.2)
+                trees[2 * i + j] = (side * TREE_X, start + i * TREE_STEP, 25 * s, 15 * s)
+
+        # seconds the runner takes to cross one row at the current speed
+        row_time = SLOT_LEN / self.game_speed * TICK
+        for row_y in range(start, start + CHUNK_LEN, SLOT_LEN):
+            if row_y < SAFE_START:
+                continue
+            self.coin_due += row_time / coin_period
+            if self.coin_due >= 1 and self.emit_coin(row_y):
+                self.coin_due %= 1.0
+
+            self.ob_due += row_time / ob_period
+            if self.ob_due >= 1 and self.emit_obstacles(row_y):
+                self.ob_due %= 1.0
+
+            self.mg_due += row_time / mg_period
+            if self.mg_due >= 1 and self.emit_magnet(row_y):
+                self.mg_due %= 1.0
+
+    def emit_coin(self, row_y):
+        """A line of coin_line coins in a free lane; False if every lane is busy."""
+        lanes = FREE_LANES[self.lane_occ.mask(row_y)]
+        if not lanes:
+            return False
+        lane = self.coin_rng.choice(lanes)
+        y = row_y + self.coin_rng.randint(0, 200)
+        # coin type: normal (1 point) or double (2 points)
+        kind = COIN_DOUBLE if self.coin_rng.random() < coin_double_prob else COIN_NORMAL
+        ahead = self.track_scroll - self.runner_forward
+        for k in range(coin_line):
+            self.coins.add(LANE_X[lane], y + k * COIN_SPACING - ahead, 20, kind)
+        self.lane_occ.occupy(lane, y + (coin_line - 1) * COIN_SPACING + coin_gap)
+        return True
+
+    def emit_obstacles(self, row_y):
+        """One obstacle row from the pattern tables; False if none fits here."""
+        blocked = self.lane_occ.mask(row_y)
+        # the row must leave a lane free that the last one left free too, unless
+        # that one is far enough back to switch lanes in between
+        last = self.ob_last_row if row_y - self.ob_last_y < min_y_gap else 0
+        k = self.ob_rng.randint(0, 1)                          # one lane or two
+        rows = OB_PATTERNS[k][last][blocked] or OB_PATTERNS[1 - k][last][blocked]
+        if not rows:
+            return False
+        if self.ob_rng.random() < (0.6, 0.7)[k]:
+            # favour the lanes the last few obstacles used least
+            row = min(rows, key=lambda m: sum(self.ob_lane_use[i] for i in MASK_LANES[m]))
+        else:
+            row = self.ob_rng.choice(rows)
+
+        base_y = row_y + self.ob_rng.randint(20, 100)
+        ahead = self.track_scroll - self.runner_forward
+        for lane in MASK_LANES[row]:
+            y = base_y + self.ob_rng.randint(-20, 20)
+            kind = OB_LIFE if self.ob_rng.random() < 0.25 else OB_NORMAL
+            self.obstacles.add(LANE_X[lane], y - ahead, 10, kind)
+            self.lane_occ.occupy(lane, y + min_y_gap)
+            self.note_obstacle_lane(lane)
+        self.ob_last_row, self.ob_last_y = row, base_y
+        return True
+
+    def note_obstacle_lane(self, lane):
+        # keep ob_lane_use equal to the lane counts in recent_ob_lanes
+        if len(self.recent_ob_lanes) == self.recent_ob_lanes.maxlen:
+            self.ob_lane_use[self.recent_ob_lanes[0]] -= 1
+        self.recent_ob_lanes.append(lane)
+        self.ob_lane_use[lane] += 1
+
+    def emit_magnet(self, row_y):
+        """A magnet in a free lane; False if every lane is busy."""
+        lanes = FREE_LANES[self.lane_occ.mask(row_y)]
+        if not lanes:
+            return False
+        lane = self.mg_rng.choice(lanes)
+        y = row_y + self.mg_rng.randint(0, 150)
+        self.magnets.add(LANE_X[lane], y - (self.track_scroll - self.runner_forward), 25)
+        self.lane_occ.occupy(lane, y + mg_gap)
+        return True
+
+    # Input.  These are what the player's keys do; the GLUT callbacks in
+    # project.py record them and call in here.
+    def keyboard(self, key):
+        if key == b'r':
+            self.reset()
+            self.log("Game Reset!")
+        elif key == b' ':
+            self.toggle_pause()
+        elif key == b'd':
+            self.start_transition(1)
+        elif key == b'a':
+            self.start_transition(-1)
+
+    def special(self, key):
+        if key == KEY_LEFT:
+            self.switch_lane(-1)
+        elif key == KEY_RIGHT:
+            self.switch_lane(1)
+
+    def switch_lane(self, d):
+        # only once the runner has (nearly) arrived in its lane
+        lane = self.lane_idx + d
+        if 0 <= lane < len(LANE_X) and abs(self.runner_side - self.runner_side_goal) < 5:
+            self.lane_idx = lane
+            self.runner_side_goal = LANE_X[lane]
+            self.bus.emit(LaneSwitch(lane))
+
+    def toggle_pause(self):
+        if self.is_running:
+            self.is_running = False
+            self.paused = True
+            self.log("Paused")
+        else:
+            self.is_running = True
+            self.paused = False
+            self.log("Resumed")
+
+    def start_transition(self, d):
+        """Start turning to day (+1) or night (-1) unless already there."""
+        if self.is_transitioning or self.is_day == (d == 1):
+            return
+        self.is_transitioning = True
+        self.trans_dir = d
+        self.log("Transitioning to day..." if d == 1 else "Transitioning to night...")
+
+    # Record/replay
+    def record_input(self, kind, *args):
+        if self.input_log is not None:
+            # GLUT constants are int subclasses that print as their names
+            self.input_log.append((self.tick_no, kind) + tuple(int(a) for a in args))
+
+    def apply_input(self, event):
+        """Re-issue one recorded event the way the player's input was handled."""
+        tick, kind, *args = event
+        if kind == 'S':
+            self.reset(args[0])
+        elif kind == 'K':
+            self.keyboard(bytes(args))
+        elif kind == 'P':
+            self.special(args[0])
+        elif kind == 'E':
+            self.replay_queue.clear()
+            self.is_running = False
+            self.paused = True
+            self.log("Replay finished")
+        if kind in 'PM' and self.view_input:
+            self.view_input(event)
+
+    def apply_due_inputs(self):
+        # everything recorded before the step about to run (ticks restart at S)
+        while self.replay_queue and self.replay_queue[0][0] <= self.tick_no:
+            self.apply_input(self.replay_queue.popleft())
+
+    def run(self, ticks, dt=TICK, seed=None):
+        """Play a fresh game for up to `ticks` steps (or until game over)."""
+        self.reset(seed)
+        n = 0
+        while n < ticks and self.is_running:
+            self.step(dt)
+            n += 1
+        return {
+            'ticks': n,
+            'sim_time': self.sim_time,
+            'meters': self.meters,
+            'points': self.points,
+            'lives': self.lives,
+            'game_over': not self.is_running,
+        }
@@ -0,0 +1,90 @@
+"""Gameplay events and the bus that delivers them.
+
+Gameplay code describes what happened with a small event tuple and hands
+it to EventBus.emit(); whoever subscribed decides what to do with it.  With
+no subscribers an emit costs a dict lookup.  LogSink is the subscriber the
+windowed game uses: it only queues events, and a background thread turns
+them into lines and writes them, so a slow stdout never stalls a frame.
+"""
+import queue
+import sys
+import threading
+from collections import namedtuple
+
+CoinCollected = namedtuple('CoinCollected', 'count gained points')
+LifeLost = namedtuple('LifeLost', 'lives')
+GameOver = namedtuple('GameOver', 'points meters')
+MagnetOn = namedtuple('MagnetOn', 'seconds')
+MagnetOff = namedtuple('MagnetOff', '')
+LaneSwitch = namedtuple('LaneSwitch', 'lane')
+Notice = namedtuple('Notice', 'text')          # free-form status messages
+
+MESSAGES = {
+    CoinCollected: "Collected {count} coin(s)! +{gained} points. Total points: {points}",
+    LifeLost: "Black box hit! Life remaining: {lives}",
+    GameOver: "Game Over! Final points: {points}",
+    MagnetOn: "Magnet collected! Active for {seconds:.1f} more seconds",
+    MagnetOff: "Magnet effect ended",
+    LaneSwitch: "Switching to lane {lane}",
+    Notice: "{text}",
+}
+
+
+class EventBus:
+
+    def __init__(self):
+        self.subscribers = {}            # event type -> [callable]
+
+    def subscribe(self, fn, *types):
+        """Call fn(event) for every event of `types` (default: all of them)."""
+        for t in types or MESSAGES:
+            self.subscribers.setdefault(t, []).append(fn)
+
+    def unsubscribe(self, fn):
+        for fns in self.subscribers.values():
+            if fn in fns:
+                fns.remove(fn)
+
+    def emit(self, event):
+        for fn in self.subscribers.get(type(event), ()):
+            fn(event)
+
+
+class LogSink:
+    """Subscriber that writes events as text lines from its own thread.
+
+    Lines that queue up while the thread is writing go out in one write.
+    close() flushes everything still queued.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+        self.thread.start()
+
+    def __call__(self, event):
+        self.queue.put(event)
+
+    def _run(self):
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = batch[:batch.index(None)]
+            if batch:
+                stream = self.stream or sys.stdout
+                stream.write("".join(MESSAGES[type(e)].format(**e._asdict()) + "\n"
+                                     for e in batch))
+                stream.flush()
+
+    def close(self, timeout=1.0):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
@@ -0,0 +1,94 @@
+"""The runner's simulation state as one object that can be copied cheaply.
+
+GameState holds everything step() carries from one tick to the next:
+plain values in slots, plus the entity stores, chunk ring, lane occupancy,
+RNG streams and a few short lists.  snapshot() copies all of it in time
+proportional to the number of live entities (tens of microseconds for a
+normal track), and restore() puts a snapshot back, so a bot can try a move
+a few hundred ticks ahead and rewind, or a test can fork a run.
+
+Settings (speeds, spawn periods and so on) are not state; they stay
+module-level in engine.py, which also holds the logic that advances
+the state (GameSession).
+"""
+import random
+from collections import deque
+from operator import attrgetter
+
+from entities import EntityStore
+from patterns import LaneOccupancy
+
+
+class Snapshot:
+    __slots__ = ('values', 'parts', 'rngs', 'lists')
+
+    def __init__(self, values, parts, rngs, lists):
+        self.values = values
+        self.parts = parts
+        self.rngs = rngs
+        self.lists = lists
+
+
+class GameState:
+
+    VALUES = (
+        'lane_idx',                      # lane the runner is in or heading for
+        'runner_forward',                # y of the runner (entities scroll past it)
+        'runner_side', 'runner_side_goal',   # x now, and x of lane_idx
+        'track_scroll',                  # distance run (track coordinates = y + this)
+        'game_speed', 'anim_curr',
+        'is_running',
+        'paused',                        # stopped by the player, not by game over
+        'score', 'points', 'meters', 'lives', 'sim_time',
+        'tick_no',                       # steps since the last reset (replay timestamps)
+        # what the last step() changed, so frames can be drawn between two ticks
+        'prev_runner_side', 'prev_track_scroll',
+        'last_move',                     # how far entities scrolled in the last tick
+        'is_day', 'is_transitioning', 'trans_dir',
+        'coin_due', 'ob_due', 'mg_due',  # fractional spawns carried from row to row
+        'mag_on', 'mag_time_left',
+        'ob_last_row', 'ob_last_y',      # lane mask and track y of the last obstacle row
+        'game_seed',
+    )
+    PARTS = ('coins', 'obstacles', 'magnets', 'track_chunks', 'lane_occ')   # snapshot()/restore()
+    RNGS = ('coin_rng', 'ob_rng', 'mg_rng', 'scenery_rng')
+    LISTS = ('recent_ob_lanes', 'ob_lane_use', 'bg_rgb')
+    __slots__ = VALUES + PARTS + RNGS + LISTS
+
+    def __init__(self, track_chunks):
+        for name in self.VALUES:
+            setattr(self, name, None)       # set by GameSession.reset
+        # day/night carries over from one game to the next
+        self.is_day = False
+        self.is_transitioning = False
+        self.trans_dir = 0                  # +1 night to day, -1 day to night
+        self.coins = EntityStore()
+        self.obstacles = EntityStore()
+        self.magnets = EntityStore()
+        self.track_chunks = track_chunks
+        self.lane_occ = LaneOccupancy()
+        for name in self.RNGS:
+            setattr(self, name, random.Random())
+        self.recent_ob_lanes = deque(maxlen=6)   # lanes of the last few obstacles
+        self.ob_lane_use = [0, 0, 0]             # how often each lane is in there
+        self.bg_rgb = [0.2, 0.3, 0.5]
+
+    def snapshot(self):
+        return Snapshot(_get_values(self),
+                        tuple(getattr(self, name).snapshot() for name in self.PARTS),
+                        tuple(getattr(self, name).getstate() for name in self.RNGS),
+                        tuple(getattr(self, name).copy() for name in self.LISTS))
+
+    def restore(self, snap):
+        """Return to `snap`; the same snapshot can be restored any number of times."""
+        for name, value in zip(self.VALUES, snap.values):
+            setattr(self, name, value)
+        for name, part in zip(self.PARTS, snap.parts):
+            getattr(self, name).restore(part)
+        for name, rng in zip(self.RNGS, snap.rngs):
+            getattr(self, name).setstate(rng)
+        for name, items in zip(self.LISTS, snap.lists):
+            setattr(self, name, items.copy())
+
+
+_get_values = attrgetter(*GameState.VALUES)
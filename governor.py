@@ -0,0 +1,51 @@
+"""Adaptive quality: trade detail for a steady frame rate.
+
+QualityGovernor is fed the time each frame took and picks one of a list
+of quality levels (lowest first; what a level means is up to the caller).
+It judges the mean over a sliding window of frames: above the frame
+budget by more than `slack` it drops a level, below `headroom` of the
+budget it climbs one.  The gap between the two thresholds is the
+hysteresis; on top of it the window starts over after every change, so
+each level is measured for a full window before the next move and a
+level that only just fits is not left and re-entered every few frames.
+"""
+from collections import deque
+
+
+class QualityGovernor:
+
+    def __init__(self, levels, target_fps, window=45, slack=1.1, headroom=0.7):
+        self.levels = levels
+        self.level = len(levels) - 1     # start at full detail
+        self.budget = 1.0 / target_fps
+        self.slack = slack
+        self.headroom = headroom
+        self.times = deque(maxlen=window)
+        self.total = 0.0
+
+    @property
+    def quality(self):
+        return self.levels[self.level]
+
+    def record(self, seconds):
+        """Add one frame time; True if that changed the level."""
+        if len(self.times) == self.times.maxlen:
+            self.total -= self.times[0]
+        self.times.append(seconds)
+        self.total += seconds
+        if len(self.times) < self.times.maxlen:
+            return False
+
+        mean = self.total / len(self.times)
+        if mean > self.budget * self.slack and self.level > 0:
+            self.set_level(self.level - 1)
+            return True
+        if mean < self.budget * self.headroom and self.level < len(self.levels) - 1:
+            self.set_level(self.level + 1)
+            return True
+        return False
+
+    def set_level(self, level):
+        self.level = level
+        self.times.clear()
+        self.total = 0.0
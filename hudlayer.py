@@ -0,0 +1,171 @@
+"""HUD text cached in a texture.
+
+GLUT bitmap text costs one ctypes call per character plus a projection
+set-up per line, and the HUD has a few hundred characters that barely ever
+change.  HudLayer draws the text into a texture through a framebuffer
+object instead, and only the lines whose text changed since the last
+frame: a changed line's band of the texture is cleared and drawn again.
+Static lines are drawn once, when the layer is made.  Every frame then
+costs one blended quad over the part of the texture that holds text.
+
+Lines are keyed by position.  A line's band runs from its x to the right
+edge of the texture and from `descent` pixels below its baseline to
+`ascent` above it, so two lines must not share a band.  How far the text
+actually reaches is read back from the raster position after drawing it.
+"""
+import math
+
+from OpenGL.GL import *
+
+
+class HudLayer:
+
+    @classmethod
+    def create(cls, width, height, draw_text, static=(), ortho=None):
+        """A layer for the current context, or None without framebuffer objects."""
+        if not (bool(glGenFramebuffers) and bool(glFramebufferTexture2D)):
+            return None
+        try:
+            return cls(width, height, draw_text, static, ortho)
+        except Exception as e:           # incomplete framebuffer and the like
+            print(f"HUD layer unavailable: {e}")
+            return None
+
+    def __init__(self, width, height, draw_text, static=(), ortho=None,
+                 descent=6, ascent=20):
+        """draw_text(x, y, text) draws one line in `ortho` coordinates
+        (default: pixels) into whatever framebuffer is bound."""
+        self.width = width
+        self.height = height
+        self.draw_text = draw_text
+        ow, oh = ortho or (width, height)
+        self.sx, self.sy = width / ow, height / oh
+        self.descent = descent
+        self.ascent = ascent
+        self.shown = {}                  # (x, y) -> text in the texture
+        self.extent = {}                 # (x, y) -> pixel box (x0, y0, x1, y1) of its text
+        self.redrawn = 0                 # lines drawn by the last update()
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0,
+                               GL_TEXTURE_2D, self.texture, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            self.release()
+            raise RuntimeError(f"framebuffer status 0x{status:x}")
+
+        self._begin()
+        glClearColor(0, 0, 0, 0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        for x, y, text in static:
+            self._draw_line(x, y, text)
+        self._end()
+
+    def _begin(self):
+        self._viewport = glGetIntegerv(GL_VIEWPORT)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_SCISSOR_BIT)
+        glDisable(GL_DEPTH_TEST)
+
+    def _end(self):
+        glPopAttrib()
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(*self._viewport)
+
+    def _draw_line(self, x, y, text):
+        self.draw_text(x, y, text)
+        px, py = int(x * self.sx), int(y * self.sy)
+        end = math.ceil(glGetFloatv(GL_CURRENT_RASTER_POSITION)[0])
+        self.extent[x, y] = (px, py - self.descent, max(end, px), py + self.ascent)
+
+    def update(self, lines):
+        """Show `lines`, (x, y, text) each, besides the static ones.
+
+        Lines whose text is unchanged are left alone, and lines no longer
+        given are erased.  Returns how many lines were redrawn.
+        """
+        want = {(x, y): text for x, y, text in lines}
+        dirty = [(key, text) for key, text in want.items() if self.shown.get(key) != text]
+        dirty += [(key, '') for key in self.shown if key not in want]
+        self.redrawn = len(dirty)
+        if not dirty:
+            return 0
+
+        self._begin()
+        glEnable(GL_SCISSOR_TEST)
+        glClearColor(0, 0, 0, 0)
+        for (x, y), text in dirty:
+            px, py = int(x * self.sx), int(y * self.sy)
+            glScissor(px, py - self.descent, self.width - px, self.descent + self.ascent)
+            glClear(GL_COLOR_BUFFER_BIT)
+            if text:
+                self._draw_line(x, y, text)
+                self.shown[x, y] = text
+            else:
+                del self.shown[x, y]
+                del self.extent[x, y]
+        self._end()
+        return len(dirty)
+
+    def draw(self):
+        """Blend the text in the layer over the viewport."""
+        if not self.extent:
+            return
+        boxes = self.extent.values()
+        x0 = max(min(b[0] for b in boxes), 0)
+        y0 = max(min(b[1] for b in boxes), 0)
+        x1 = min(max(b[2] for b in boxes), self.width)
+        y1 = min(max(b[3] for b in boxes), self.height)
+        u0, v0, u1, v1 = x0 / self.width, y0 / self.height, x1 / self.width, y1 / self.height
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_TEXTURE_BIT | GL_CURRENT_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(1, 1, 1, 1)
+
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+
+        glBegin(GL_QUADS)
+        # texture and viewport coincide, so texture coordinates map to clip
+        # space as 2u - 1
+        glTexCoord2f(u0, v0)
+        glVertex2f(2 * u0 - 1, 2 * v0 - 1)
+        glTexCoord2f(u1, v0)
+        glVertex2f(2 * u1 - 1, 2 * v0 - 1)
+        glTexCoord2f(u1, v1)
+        glVertex2f(2 * u1 - 1, 2 * v1 - 1)
+        glTexCoord2f(u0, v1)
+        glVertex2f(2 * u0 - 1, 2 * v1 - 1)
+        glEnd()
+
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPopAttrib()
+
+    def release(self):
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteTextures([self.texture])
+        self.shown.clear()
+        self.extent.clear()
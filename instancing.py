@@ -0,0 +1,156 @@
+"""Instanced drawing for the runner's repeated objects.
+
+Each mesh lives in a static vertex/index buffer.  Per-instance offset,
+scale and colour are packed into one float32 array per batch, uploaded
+once per frame (or once ever, for scenery) and drawn with a single
+glDrawElementsInstanced call.  A draw can also add a `shift` to every
+offset and multiply every colour by a `tint`, so static batches can be
+scrolled and dimmed for night without re-uploading them.
+
+draw() does a whole draw; begin()/bind_mesh()/draw_batch()/end() let a
+caller share the program and mesh setup across several batches.
+"""
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from OpenGL.arrays import vbo
+
+VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec3 offset;
+attribute vec3 scale;
+attribute vec3 colour;
+uniform vec3 shift;
+uniform vec3 tint;
+varying vec3 v_colour;
+
+void main() {
+    vec3 p = offset + shift + position * scale;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(p, 1.0);
+    v_colour = colour * tint;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+varying vec3 v_colour;
+
+void main() {
+    gl_FragColor = vec4(v_colour, 1.0);
+}
+"""
+
+# per-instance record: offset xyz, scale xyz, colour rgb
+INSTANCE_FLOATS = 9
+STRIDE = INSTANCE_FLOATS * 4
+
+MODES = {'triangles': GL_TRIANGLES, 'lines': GL_LINES}
+
+
+def instance_array(n):
+    """Scratch (n, 9) float32 array laid out as the shader expects."""
+    return np.empty((n, INSTANCE_FLOATS), dtype=np.float32)
+
+
+class InstancedRenderer:
+
+    def __init__(self):
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+        )
+        self.loc = {name: glGetAttribLocation(self.program, name)
+                    for name in ('position', 'offset', 'scale', 'colour')}
+        self.shift_loc = glGetUniformLocation(self.program, 'shift')
+        self.tint_loc = glGetUniformLocation(self.program, 'tint')
+        self.meshes = {}                 # name -> (vertex VBO, index VBO, count, mode)
+        self.batches = {}                # name -> (instance VBO, count)
+        self._mesh = None                # (index VBO, count, mode) bound by bind_mesh
+
+    @classmethod
+    def create(cls):
+        """A renderer for the current context, or None if it can't instance."""
+        if not (bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)):
+            return None
+        try:
+            return cls()
+        except Exception as e:           # shader compile/link/validate failure
+            print(f"Instanced rendering unavailable: {e}")
+            return None
+
+    def add_mesh(self, name, mesh):
+        vertices = vbo.VBO(mesh.vertices, usage=GL_STATIC_DRAW)
+        indices = vbo.VBO(mesh.indices, usage=GL_STATIC_DRAW, target=GL_ELEMENT_ARRAY_BUFFER)
+        self.meshes[name] = (vertices, indices, len(mesh.indices), MODES[mesh.mode])
+
+    def upload(self, batch, data):
+        """Replace the instances of `batch` with `data` (from instance_array)."""
+        entry = self.batches.get(batch)
+        if entry is None:
+            buf = vbo.VBO(data, usage=GL_STREAM_DRAW)
+        else:
+            buf = entry[0]
+            buf.set_array(data)
+        self.batches[batch] = (buf, len(data))
+
+    def begin(self, tint=(1.0, 1.0, 1.0)):
+        """Start a run of draws sharing one tint (see bind_mesh, draw_batch)."""
+        glUseProgram(self.program)
+        glUniform3f(self.tint_loc, *tint)
+
+    def bind_mesh(self, mesh):
+        vertices, indices, n_idx, mode = self.meshes[mesh]
+        loc = self.loc['position']
+        vertices.bind()
+        glEnableVertexAttribArray(loc)
+        glVertexAttribPointer(loc, 3, GL_FLOAT, GL_FALSE, 12, vertices)
+        indices.bind()
+        self._mesh = (indices, n_idx, mode)
+
+    def draw_batch(self, batch, shift=(0.0, 0.0, 0.0)):
+        """Draw the bound mesh once per instance of `batch`."""
+        buf, count = self.batches[batch]
+        if count == 0:
+            return
+        _, n_idx, mode = self._mesh
+        loc = self.loc
+        glUniform3f(self.shift_loc, *shift)
+
+        buf.bind()
+        for i, name in enumerate(('offset', 'scale', 'colour')):
+            glEnableVertexAttribArray(loc[name])
+            glVertexAttribPointer(loc[name], 3, GL_FLOAT, GL_FALSE, STRIDE, buf + i * 12)
+            glVertexAttribDivisor(loc[name], 1)
+
+        glDrawElementsInstanced(mode, n_idx, GL_UNSIGNED_INT, None, count)
+
+        for name in ('offset', 'scale', 'colour'):
+            glVertexAttribDivisor(loc[name], 0)
+            glDisableVertexAttribArray(loc[name])
+        buf.unbind()
+
+    def end(self):
+        if self._mesh is not None:
+            self._mesh[0].unbind()
+            self._mesh = None
+        glDisableVertexAttribArray(self.loc['position'])
+        glUseProgram(0)
+
+    def draw(self, mesh, batch, shift=(0.0, 0.0, 0.0), tint=(1.0, 1.0, 1.0)):
+        if self.batches[batch][1] == 0:
+            return
+        self.begin(tint)
+        self.bind_mesh(mesh)
+        self.draw_batch(batch, shift)
+        self.end()
+
+    def release(self):
+        for vertices, indices, _, _ in self.meshes.values():
+            vertices.delete()
+            indices.delete()
+        for buf, _ in self.batches.values():
+            buf.delete()
+        self.meshes.clear()
+        self.batches.clear()
+        glDeleteProgram(self.program)
@@ -0,0 +1,76 @@
+"""Distance-based level of detail for the round primitives.
+
+Spheres and cylinders come in a few tessellations, finest first.  Each
+frame an object's level is picked from its projected size on screen (the
+pixel diameter of its bounding sphere), so a coin 1400 units away is drawn
+with a fraction of the triangles of one next to the runner.
+
+To stop objects flickering between two levels when their size hovers
+around a threshold, an object keeps its previous level until its size has
+moved past the threshold by a `hysteresis` fraction.  LodState remembers
+those previous levels by object id.
+"""
+import math
+
+import numpy as np
+
+class LodPolicy:
+    """Maps projected sizes to levels.
+
+    thresholds  pixel diameters below which detail drops a level (descending)
+    hysteresis  how far past a threshold a size must go to change level
+    bias        multiplies every projected size; below 1 drops detail
+                sooner, which is what software rasterisers like llvmpipe want
+    """
+
+    def __init__(self, thresholds=(32, 12), hysteresis=0.15, bias=1.0,
+                 fov_y=60, viewport_h=800):
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.hysteresis = hysteresis
+        self.bias = bias
+        self.focal = viewport_h / 2 / math.tan(math.radians(fov_y) / 2)
+        # size band [lo, hi) of every level, for the hysteresis test
+        self.lo = np.append(self.thresholds, 0.0)
+        self.hi = np.insert(self.thresholds, 0, np.inf)
+
+    def pixels(self, centres, radii, eye):
+        """Projected diameters (pixels, bias applied) of bounding spheres."""
+        dist = np.linalg.norm(centres - eye, axis=1)
+        return 2 * radii * self.focal * self.bias / np.maximum(dist, 1e-6)
+
+    def levels(self, size, prev=None):
+        """Level per size; `prev` (-1 = none) holds levels inside their band."""
+        level = np.searchsorted(-self.thresholds, -size)
+        if prev is not None:
+            p = np.maximum(prev, 0)
+            h = self.hysteresis
+            stay = (prev >= 0) & (size >= self.lo[p] * (1 - h)) & (size < self.hi[p] * (1 + h))
+            level = np.where(stay, prev, level)
+        return level
+
+
+class LodState:
+    """Levels picked last frame for one set of objects, keyed by id."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.ids = np.empty(0, dtype=np.int64)      # sorted
+        self.levels = np.empty(0, dtype=np.intp)
+
+    def previous(self, ids):
+        if not len(self.ids):
+            return np.full(len(ids), -1)
+        k = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return np.where(self.ids[k] == ids, self.levels[k], -1)
+
+    def select(self, ids, centres, radii, eye):
+        """Level for each object, remembered for the next frame."""
+        size = self.policy.pixels(centres, radii, eye)
+        level = self.policy.levels(size, self.previous(ids))
+        order = np.argsort(ids)
+        self.ids, self.levels = ids[order], level[order]
+        return level
+
+    def clear(self):
+        self.ids = self.ids[:0]
+        self.levels = self.levels[:0]
@@ -0,0 +1,106 @@
+"""Shared quadric and compiled primitive meshes for immediate-mode drawing.
+
+gluSphere(gluNewQuadric(), ...) allocates a native GLUquadric on every call
+and nothing ever frees it.  MeshCache owns a single quadric and compiles
+each (shape, size, slices, stacks) combination into a display list the
+first time it is drawn, so steady-state frames allocate nothing.
+"""
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+import meshes
+
+
+class MeshCache:
+    """Lazily built primitives; call release() before the context goes away.
+
+    `allocated` and `freed` count native objects (the quadric and display
+    lists).  `live` should level off after the first frames and drop to
+    zero after release(); soak tests can assert on it.
+    """
+
+    def __init__(self):
+        self._quadric = None
+        self.lists = {}
+        self.allocated = 0
+        self.freed = 0
+
+    @property
+    def live(self):
+        return self.allocated - self.freed
+
+    def quadric(self):
+        """The shared GLUQuadric (created on first use)."""
+        if self._quadric is None:
+            self._quadric = gluNewQuadric()
+            self.allocated += 1
+        return self._quadric
+
+    def list(self, key, build):
+        """Display list for `key`, compiled from build() the first time."""
+        lst = self.lists.get(key)
+        if lst is None:
+            lst = glGenLists(1)
+            glNewList(lst, GL_COMPILE)
+            build()
+            glEndList()
+            self.lists[key] = lst
+            self.allocated += 1
+        return lst
+
+    def _call(self, key, build):
+        if key not in self.lists and glGetIntegerv(GL_LIST_INDEX):
+            # already inside someone's glNewList: just record the geometry
+            build()
+            return
+        glCallList(self.list(key, build))
+
+    # (key, build) for each shape; *_list() returns the display list,
+    # the plain methods draw it
+    def _sphere(self, radius, slices, stacks):
+        return (('sphere', radius, slices, stacks),
+                lambda: gluSphere(self.quadric(), radius, slices, stacks))
+
+    def _cylinder(self, base, top, height, slices, stacks):
+        return (('cylinder', base, top, height, slices, stacks),
+                lambda: gluCylinder(self.quadric(), base, top, height, slices, stacks))
+
+    def _cube(self, size):
+        return ('cube', size), lambda: emit_mesh(meshes.cube(size))
+
+    def sphere_list(self, radius, slices, stacks):
+        return self.list(*self._sphere(radius, slices, stacks))
+
+    def cylinder_list(self, base, top, height, slices, stacks):
+        return self.list(*self._cylinder(base, top, height, slices, stacks))
+
+    def cube_list(self, size):
+        return self.list(*self._cube(size))
+
+    def sphere(self, radius, slices, stacks):
+        self._call(*self._sphere(radius, slices, stacks))
+
+    def cylinder(self, base, top, height, slices, stacks):
+        self._call(*self._cylinder(base, top, height, slices, stacks))
+
+    def cube(self, size):
+        self._call(*self._cube(size))
+
+    def release(self):
+        for lst in self.lists.values():
+            glDeleteLists(lst, 1)
+            self.freed += 1
+        self.lists.clear()
+        if self._quadric is not None:
+            gluDeleteQuadric(self._quadric)
+            self._quadric = None
+            self.freed += 1
+
+
+def emit_mesh(mesh):
+    """Send a meshes.Mesh through glBegin/glEnd (for display list compiles)."""
+    glBegin(GL_LINES if mesh.mode == 'lines' else GL_TRIANGLES)
+    v = mesh.vertices.tolist()
+    for i in mesh.indices.tolist():
+        glVertex3f(*v[i])
+    glEnd()
@@ -0,0 +1,79 @@
+"""Pre-tessellated meshes for the runner's primitives.
+
+These build the same shapes the game used to get from gluSphere,
+gluCylinder and glutSolidCube, as plain NumPy vertex/index arrays that can
+be uploaded to buffers once and drawn many times.
+"""
+import math
+
+import numpy as np
+
+
+class Mesh:
+    """Vertex positions (n, 3) float32 and an index array for `mode`."""
+
+    def __init__(self, vertices, indices, mode='triangles'):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.mode = mode
+
+    def transformed(self, rot_x=0.0, offset=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0)):
+        """Copy scaled, then rotated about the X axis by rot_x degrees, then translated."""
+        v = self.vertices.astype(np.float64) * scale
+        if rot_x:
+            a = math.radians(rot_x)
+            c, s = math.cos(a), math.sin(a)
+            y, z = v[:, 1].copy(), v[:, 2].copy()
+            v[:, 1] = y * c - z * s
+            v[:, 2] = y * s + z * c
+        return Mesh(v + offset, self.indices, self.mode)
+
+
+def _grid_indices(slices, stacks):
+    # two triangles per quad of a (stacks + 1) x (slices + 1) vertex grid
+    i, j = np.meshgrid(np.arange(stacks), np.arange(slices), indexing='ij')
+    a = i * (slices + 1) + j
+    b = a + slices + 1
+    return np.stack([a, b, a + 1, a + 1, b, b + 1], axis=-1).reshape(-1)
+
+
+def sphere(radius, slices, stacks):
+    """Sphere around the origin, poles on the Z axis (like gluSphere)."""
+    phi = np.linspace(0.0, math.pi, stacks + 1)[:, None]
+    theta = np.linspace(0.0, 2 * math.pi, slices + 1)[None, :]
+    v = np.stack([np.sin(phi) * np.cos(theta),
+                  np.sin(phi) * np.sin(theta),
+                  np.cos(phi) + 0 * theta], axis=-1).reshape(-1, 3)
+    return Mesh(v * radius, _grid_indices(slices, stacks))
+
+
+def cylinder(base, top, height, slices, stacks):
+    """Open tube from z=0 to z=height (like gluCylinder)."""
+    t = np.linspace(0.0, 1.0, stacks + 1)[:, None]
+    theta = np.linspace(0.0, 2 * math.pi, slices + 1)[None, :]
+    r = base + (top - base) * t
+    v = np.stack([r * np.cos(theta),
+                  r * np.sin(theta),
+                  height * t + 0 * theta], axis=-1).reshape(-1, 3)
+    return Mesh(v, _grid_indices(slices, stacks))
+
+
+def cube(size):
+    """Axis-aligned cube centred on the origin (like glutSolidCube)."""
+    h = size / 2.0
+    corners = np.array([[x, y, z] for x in (-h, h) for y in (-h, h) for z in (-h, h)])
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+             (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    idx = [k for a, b, c, d in faces for k in (a, b, c, a, c, d)]
+    return Mesh(corners, idx)
+
+
+def rays(inner, outer, count):
+    """Radial line segments in the XZ plane (the magnet's field lines)."""
+    ang = np.radians(np.arange(count) * 360.0 / count)
+    v = np.zeros((count * 2, 3))
+    v[0::2, 0] = inner * np.cos(ang)
+    v[0::2, 2] = inner * np.sin(ang)
+    v[1::2, 0] = outer * np.cos(ang)
+    v[1::2, 2] = outer * np.sin(ang)
+    return Mesh(v, np.arange(count * 2), mode='lines')
@@ -0,0 +1,69 @@
+"""Precomputed lane patterns for the spawner.
+
+A row of track is described by 3-bit lane masks (bit i = lane i).  Rather
+than proposing random positions and testing them against everything
+nearby, the spawner looks its choices up in tables built here once,
+indexed by the mask of lanes that are off limits.  Every entry is already
+valid, so a pick never has to be retried and costs the same however
+crowded the track is.
+
+Obstacle rows block one or two lanes.  A row is only offered after the
+last one if the two leave a lane in common free (`last | row != ALL`), so
+the runner can always get through by staying in that lane.
+"""
+import math
+
+LANES = 3
+ALL = (1 << LANES) - 1
+
+
+def lanes_of(mask):
+    return tuple(i for i in range(LANES) if mask >> i & 1)
+
+
+MASK_LANES = tuple(lanes_of(mask) for mask in range(ALL + 1))
+
+# FREE_LANES[blocked]: lanes a single item may go in
+FREE_LANES = tuple(MASK_LANES[ALL & ~mask] for mask in range(ALL + 1))
+
+# obstacle rows blocking one lane, then two
+OB_ROWS = (tuple(m for m in range(1, ALL) if len(lanes_of(m)) == 1),
+           tuple(m for m in range(1, ALL) if len(lanes_of(m)) == 2))
+
+
+def _compatible(rows, last, blocked):
+    return tuple(m for m in rows if not m & blocked and m | last != ALL)
+
+
+# OB_PATTERNS[k][last][blocked]: (k+1)-lane rows that may follow row `last`
+OB_PATTERNS = tuple(tuple(tuple(_compatible(rows, last, blocked) for blocked in range(ALL + 1))
+                          for last in range(ALL + 1))
+                    for rows in OB_ROWS)
+
+
+class LaneOccupancy:
+    """Per lane, the track position up to which something keeps it busy."""
+
+    def __init__(self):
+        self.until = [-math.inf] * LANES
+
+    def clear(self):
+        self.until[:] = [-math.inf] * LANES
+
+    def mask(self, y):
+        """Lanes still busy at track position y."""
+        m = 0
+        for i in range(LANES):
+            if self.until[i] > y:
+                m |= 1 << i
+        return m
+
+    def snapshot(self):
+        return tuple(self.until)
+
+    def restore(self, snap):
+        self.until[:] = snap
+
+    def occupy(self, lane, until):
+        if until > self.until[lane]:
+            self.until[lane] = until
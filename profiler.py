@@ -0,0 +1,182 @@
+"""Per-phase frame timing for the runner.
+
+FrameProfiler swaps the module-level functions (or methods) it is told
+about for timed wrappers, and (optionally) every gl*/glu*/glut* name in a set of modules for
+counting wrappers.  Nothing is wrapped while it is disabled, so the cost of
+having it around is one attribute check per frame.
+
+Draw code can also add to named per-frame counters (objects culled and
+so on) with tally().  Results go into a fixed-size ring buffer with one
+row per frame.
+"""
+import csv
+import time
+
+import numpy as np
+
+OTHER = 'other'                  # GL calls made outside any named phase
+
+
+class FrameProfiler:
+
+    def __init__(self, phases, frames=600, counters=()):
+        self.phases = list(phases) + [OTHER]
+        self.col = {name: i for i, name in enumerate(self.phases)}
+        self.counters = list(counters)
+        self.counter_col = {name: i for i, name in enumerate(self.counters)}
+        self.times = np.zeros((frames, len(self.phases)))
+        self.calls = np.zeros((frames, len(self.phases)), dtype=np.int64)
+        self.counts = np.zeros((frames, len(self.counters)), dtype=np.int64)
+        self.frame_ms = np.zeros(frames)
+        self.frame_no = np.zeros(frames, dtype=np.int64)
+        self.head = 0                    # next ring row to write
+        self.count = 0                   # valid rows
+        self.frames_seen = 0
+        self.enabled = False
+        self._originals = {}
+        self._stack = []
+        self._row_t = [0.0] * len(self.phases)
+        self._row_calls = [0] * len(self.phases)
+        self._row_counts = [0] * len(self.counters)
+        self._t_frame = None
+
+    # -- switching on and off -------------------------------------------
+    def enable(self, owners, gl_modules=()):
+        """Time the phase functions in `owners`; count GL calls in gl_modules.
+
+        owners is a sequence of modules and classes; each phase is wrapped
+        where it is first found, and phases found nowhere stay at zero.
+        """
+        if self.enabled:
+            return
+        for name in self.phases[:-1]:
+            owner = next((o for o in owners if name in vars(o)), None)
+            if owner is None:
+                continue
+            self._patch(owner, name, self._timed(name, getattr(owner, name)))
+        for mod in gl_modules:
+            for name, fn in list(vars(mod).items()):
+                if name.startswith('gl') and callable(fn) and (mod, name) not in self._originals:
+                    self._patch(mod, name, self._counted(fn))
+        self.enabled = True
+        self._t_frame = None
+
+    def disable(self):
+        for (mod, name), fn in self._originals.items():
+            setattr(mod, name, fn)
+        self._originals.clear()
+        self._stack.clear()
+        self.enabled = False
+
+    def _patch(self, mod, name, wrapper):
+        self._originals[(mod, name)] = getattr(mod, name)
+        setattr(mod, name, wrapper)
+
+    def _timed(self, name, fn):
+        col = self.col[name]
+        stack, row_t = self._stack, self._row_t
+
+        def timed(*args, **kwargs):
+            stack.append(col)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                row_t[col] += time.perf_counter() - t0
+                stack.pop()
+        return timed
+
+    def _counted(self, fn):
+        stack, row_calls, other = self._stack, self._row_calls, self.col[OTHER]
+
+        def counted(*args, **kwargs):
+            row_calls[stack[-1] if stack else other] += 1
+            return fn(*args, **kwargs)
+        return counted
+
+    # -- recording --------------------------------------------------------
+    def tally(self, name, n):
+        self._row_counts[self.counter_col[name]] += n
+
+    def reset(self):
+        """Forget all recorded frames."""
+        self.head = self.count = self.frames_seen = 0
+        self._t_frame = None
+
+    def next_frame(self):
+        """Close the row for the frame that just finished and start a new one."""
+        now = time.perf_counter()
+        if self._t_frame is not None:
+            i = self.head
+            self.times[i] = self._row_t
+            self.calls[i] = self._row_calls
+            self.counts[i] = self._row_counts
+            self.frame_ms[i] = (now - self._t_frame) * 1000
+            self.frame_no[i] = self.frames_seen
+            self.head = (i + 1) % len(self.frame_ms)
+            self.count = min(self.count + 1, len(self.frame_ms))
+            self.frames_seen += 1
+        self._t_frame = now
+        for k in range(len(self._row_t)):
+            self._row_t[k] = 0.0
+            self._row_calls[k] = 0
+        for k in range(len(self._row_counts)):
+            self._row_counts[k] = 0
+
+    def _rows(self):
+        # valid rows, oldest first
+        n = len(self.frame_ms)
+        if self.count < n:
+            return np.arange(self.count)
+        return (np.arange(n) + self.head) % n
+
+    def stats(self):
+        """{name: (min ms, avg ms, p99 ms, avg GL calls)}, plus 'frame'."""
+        rows = self._rows()
+        if len(rows) == 0:
+            return {}
+        out = {}
+        ms = self.frame_ms[rows]
+        calls = self.calls[rows]
+        out['frame'] = (ms.min(), ms.mean(), np.percentile(ms, 99), calls.sum(axis=1).mean())
+        t = self.times[rows] * 1000
+        for name, c in self.col.items():
+            out[name] = (t[:, c].min(), t[:, c].mean(), np.percentile(t[:, c], 99), calls[:, c].mean())
+        return out
+
+    def counter_stats(self):
+        """{counter: average per frame}."""
+        rows = self._rows()
+        if len(rows) == 0:
+            return {}
+        avg = self.counts[rows].mean(axis=0)
+        return {name: avg[c] for name, c in self.counter_col.items()}
+
+    def overlay_lines(self, top=6):
+        """HUD text: the frame total and the `top` most expensive phases."""
+        st = self.stats()
+        if not st:
+            return ["profiler: collecting..."]
+        lines = ["phase              min / avg / p99 ms   gl calls"]
+        frame = st.pop('frame')
+        ranked = sorted(st.items(), key=lambda kv: -kv[1][1])[:top]
+        for name, (lo, avg, p99, calls) in [('frame', frame)] + ranked:
+            lines.append(f"{name:<18} {lo:5.2f} / {avg:5.2f} / {p99:5.2f}   {calls:6.0f}")
+        if self.counters:
+            lines.append("   ".join(f"{name} {avg:.0f}" for name, avg in self.counter_stats().items()))
+        return lines
+
+    def dump_csv(self, path):
+        rows = self._rows()
+        with open(path, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['frame', 'frame_ms', 'gl_calls']
+                       + [f'{p}_ms' for p in self.phases]
+                       + [f'{p}_calls' for p in self.phases]
+                       + self.counters)
+            for i in rows:
+                w.writerow([int(self.frame_no[i]), f'{self.frame_ms[i]:.4f}', int(self.calls[i].sum())]
+                           + [f'{t * 1000:.4f}' for t in self.times[i]]
+                           + [int(c) for c in self.calls[i]]
+                           + [int(c) for c in self.counts[i]])
+        return len(rows)
@@ -1,124 +1,103 @@
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
+import argparse
+import atexit
+import gc
+import itertools
 import math
+import sys
 import time
-import random
+from collections import namedtuple
+
+import numpy as np
+
+from culling import Frustum
+from engine import GameSession, LANE_W, TICK, COIN_KINDS, OB_KINDS, TREES_PER_CHUNK, TREE_STEP
+from events import LogSink
+from governor import QualityGovernor
+from hudlayer import HudLayer
+from instancing import InstancedRenderer, instance_array
+from lod import LodPolicy, LodState
+from meshcache import MeshCache
+from runner_model import RunnerModel
+from simthread import SimThread
+from profiler import FrameProfiler
+from renderqueue import RenderQueue, ListPass, InstancedPass, CallPass
+import meshes
+import replay
 
 # perspective field-of-view
 FOV_Y = 60                  
+ASPECT = 1.25
+NEAR, FAR = 0.1, 1500
 cam_pos = (0, -300, 200)
+frustum = None                   # set by setup_camera for the culling tests
+view_eye = None                  # camera position, for level-of-detail picks
 
-# Lanes, runner & movement
-LANE_W = 100
-LANE_X = [-LANE_W, 0, LANE_W]   # left/center/right X-positions
-
-lane_idx = 1                     # start center lane
-runner_forward = 0               # y-axis forward along track
-runner_side = LANE_X[lane_idx]   # x-axis along lanes
-runner_side_goal = runner_side   # smooth lane switching target
-
-# Animation pacing
-track_scroll = 0
-base_speed = 0.7
-game_speed = base_speed
-max_speed = 4
-lane_interp_speed = 5
-
-# Runner animation (speeds up with distance)
-anim_base = 0.02
-anim_max = 0.05
-anim_curr = anim_base
-
-
-# Game state & score
-is_running = True
-score = 0
-points = 0
-meters = 0.0
+# Wall clock (game state itself is in `session`, see reset_game)
 t_start = None
-t_pause_begin = None
+t_last = None                    # wall time of the previous scheduler frame
 is_fp = False    
-lives = 5
 
 # Arms swing tuning
 ARM_SWING_MAX = 5
 ARM_SWING_RATE = 0.02
 
-# Day/Night
-is_day = False
-bg_rgb = [0.2, 0.3, 0.5]
-is_transitioning = False
-trans_dir = 0            # +1 night to day, -1 day to night
-trans_step = 0.01
-
-#coins
-coins = []
-coin_t = 0.0
-coin_period = 2.0
-coin_pick_radius = 15
-coin_double_prob = 0.25
-
-#obstacles
-obstacles = []
-ob_t = 0.0
-ob_period = 3.5
-hit_radius = 20
-min_y_gap = 800
-
-#magnet
-magnets = []
-mg_t = 0.0
-mg_period = 25
-mag_on = False
-mag_time_left = 0.0
-mag_seconds = 10
-mag_radius = 500
-mag_pick_radius = 15
-mag_pull = 15.0
-
-def reset_game():
-    global lane_idx, runner_forward, runner_side, runner_side_goal
-    global track_scroll, game_speed, is_running, score, points
-    global meters, t_start, t_pause_begin, coins, coin_t
-    global obstacles, ob_t, anim_curr, lives
-    global magnets, mg_t, mag_on, mag_time_left
-
-    # Reset player position to center lane
-    lane_idx = 1
-    runner_forward = 0
-    runner_side = LANE_X[lane_idx]
-    runner_side_goal = runner_side
-
-    # Reset movement and animation
-    track_scroll = 0
-    game_speed = base_speed
-    anim_curr = anim_base
-
-    # Reset game state
-    is_running = True
-    score = 0
-    points = 0
-    meters = 0.0
-
-    # Reset timing
+# Frame clock (the simulation runs in engine.TICK steps)
+MAX_FRAME_DT = 0.1               # clamp long frames so nothing tunnels
+
+# Frame scheduler: fixed TICK updates from an accumulator, frames capped at
+# TARGET_FPS by glutTimerFunc, and no redraws while nothing changes
+TARGET_FPS = 60
+MAX_STEPS_PER_FRAME = 8          # beyond this a slow machine drops time
+sim_accum = 0.0
+needs_redraw = True
+
+# With --threaded the simulation steps on its own thread and the draw code
+# reads the newest RenderFrame it published instead of the session itself
+sim_thread = None
+
+# Frame profiler ('p' toggles the overlay, 'c' writes the CSV)
+PROFILE_PHASES = (
+    'update_coins', 'update_obstacles', 'update_magnets', 'update_daynight',
+    'generate_chunk',
+    'draw_bg', 'draw_ground', 'draw_trees', 'draw_track', 'draw_runner',
+    'draw_all_coins', 'draw_all_magnets', 'draw_all_obstacles', 'flush_render_queue',
+    'draw_text',
+)
+PROFILE_COUNTERS = ('visible', 'culled', 'draws', 'dropped')
+profiler = FrameProfiler(PROFILE_PHASES, counters=PROFILE_COUNTERS)
+profile_csv = "frame_profile.csv"
+
+render_alpha = 1.0               # 0 = previous tick, 1 = latest tick
+
+# Interpolated values the draw code uses (set by update_view each frame)
+view_side = 0.0
+view_scroll = 0.0
+view_shift = 0.0                 # added to entity y so they match view_scroll
+
+# colours by entity type code (see engine.py)
+COIN_RGB = np.array([[0.9, 0.9, 0.9], [1, 1, 0]], dtype=np.float32)
+OB_RGB = np.array([[1, 0, 0], [0, 0, 0]], dtype=np.float32)
+
+# The game itself (see engine.py).  Gameplay reports what happens on
+# session.bus; only the windowed game attaches a LogSink, so headless runs
+# print nothing.
+session = GameSession()
+scene = session                  # what frames draw (see sim_thread)
+
+# Record/replay (see replay.py)
+UNRECORDED_KEYS = (b'p', b'c')   # profiler keys don't touch the game
+
+def reset_game(seed=None):
+    """Start a new game and restart the frame clock."""
+    global t_start, t_last, sim_accum, render_alpha
     t_start = time.time()
-    t_pause_begin = None
-
-    # Clear all collectible items
-    coins = []
-    coin_t = 0.0
-
-    obstacles = []
-    ob_t = 0.0
-
-    lives = 5
-
-    # Reset power-ups
-    magnets = []
-    mg_t = 0.0
-    mag_on = False
-    mag_time_left = 0.0
+    t_last = None
+    sim_accum = 0.0
+    render_alpha = 1.0
+    session.reset(seed)
 
 
 def draw_bg(): #2D
@@ -133,7 +112,7 @@ def draw_bg(): #2D
     glPushMatrix()
     glLoadIdentity()
 
-    glColor3f(bg_rgb[0], bg_rgb[1], bg_rgb[2])
+    glColor3f(scene.bg_rgb[0], scene.bg_rgb[1], scene.bg_rgb[2])
     glBegin(GL_QUADS)
     glVertex2f(-1, -1)
     glVertex2f( 1, -1)
@@ -169,7 +148,32 @@ def draw_text(x, y, s, font=GLUT_BITMAP_HELVETICA_18):
     glPopMatrix()
     glMatrixMode(GL_MODELVIEW)
 
-def draw_ground():
+# Shared quadric + compiled primitives for all immediate-mode drawing
+mesh_cache = MeshCache()
+
+# Scenery cache: ground, barriers and track never change shape, so each is
+# compiled once into a display list and scrolled with one translate.  Trees
+# belong to track chunks (see generate_chunk).
+DASH_GAP = 100
+TRACK_LEN = 2000
+scenery_lists = {}
+chunk_lists = {}                 # (ring slot, day_k, spacing, crown level) -> (chunk id, display list)
+tree_shown = None                # ids of the trees in the uploaded batches
+tree_levels = None               # and the crown detail level of each
+
+
+def scenery_list(name, build):
+    lst = scenery_lists.get(name)
+    if lst is None:
+        lst = glGenLists(1)
+        glNewList(lst, GL_COMPILE)
+        build()
+        glEndList()
+        scenery_lists[name] = lst
+    return lst
+
+
+def build_ground():
     glColor3f(0.2, 0.8, 0.2)
     glBegin(GL_QUADS)
     g = 1000
@@ -179,20 +183,20 @@ def draw_ground():
     glVertex3f(-g,  g, -5)
     glEnd()
 
+
+def build_barriers():
     glColor3f(0.6, 0.3, 0.1)
     h = 50
     road_w = LANE_W * 3
 
-    # left barrier
     glBegin(GL_QUADS)
+    # left barrier
     glVertex3f(-road_w/2 - 20, -1000, 0)
     glVertex3f(-road_w/2 - 20,  1000, 0)
     glVertex3f(-road_w/2 - 20,  1000, h)
     glVertex3f(-road_w/2 - 20, -1000, h)
-    glEnd()
 
     # right barrier
-    glBegin(GL_QUADS)
     glVertex3f( road_w/2 + 20, -1000, 0)
     glVertex3f( road_w/2 + 20,  1000, 0)
     glVertex3f( road_w/2 + 20,  1000, h)
@@ -200,102 +204,209 @@ def draw_ground():
     glEnd()
 
 
-def draw_trees():
-    day_k = 1.0 if is_day else 0.4
-    road_w = LANE_W * 3
-    tree_x = road_w/2 + 80
-    step = 150
-
-    for side in (-1, 1):
-        x_pos = side * tree_x
-        for i in range(-15, 25):
-            z_pos = i * step - (track_scroll % step)
-            random.seed(i + side * 100)
-            s = random.uniform(0.8, 1.2)
-            trunk_h = 25 * s
-            crown = 15 * s
-
-            glPushMatrix()
-            glTranslatef(x_pos, z_pos, trunk_h/2)
-            glColor3f(0.4 * day_k, 0.2 * day_k, 0.1 * day_k)
-            glScalef(3, 3, trunk_h)
-            glutSolidCube(1)
-            glPopMatrix()
-
-            glPushMatrix()
-            glTranslatef(x_pos, z_pos, trunk_h + crown/2)
-            glColor3f(0.1 * day_k, 0.6 * day_k, 0.1 * day_k)
-            gluSphere(gluNewQuadric(), crown, 8, 8)
-            glPopMatrix()
+def build_trees(table, y0, day_k, slices=8, stacks=8):
+    for x_pos, y_pos, trunk_h, crown in table.tolist():
+        y_pos -= y0
+        glPushMatrix()
+        glTranslatef(x_pos, y_pos, trunk_h/2)
+        glColor3f(0.4 * day_k, 0.2 * day_k, 0.1 * day_k)
+        glScalef(3, 3, trunk_h)
+        mesh_cache.cube(1)
+        glPopMatrix()
 
+        glPushMatrix()
+        glTranslatef(x_pos, y_pos, trunk_h + crown/2)
+        glColor3f(0.1 * day_k, 0.6 * day_k, 0.1 * day_k)
+        mesh_cache.sphere(crown, slices, stacks)
+        glPopMatrix()
 
-def draw_track():
+
+def build_track():
     glColor3f(0.3, 0.3, 0.3)
     glBegin(GL_QUADS)
-
-    t_len = 2000
     t_w = LANE_W * 3
-    glVertex3f(-t_w/2, -t_len, 0)
-    glVertex3f( t_w/2, -t_len, 0)
-    glVertex3f( t_w/2,  t_len, 0)
-    glVertex3f(-t_w/2,  t_len, 0)
+    glVertex3f(-t_w/2, -TRACK_LEN, 0)
+    glVertex3f( t_w/2, -TRACK_LEN, 0)
+    glVertex3f( t_w/2,  TRACK_LEN, 0)
+    glVertex3f(-t_w/2,  TRACK_LEN, 0)
     glEnd()
 
+
+def build_dashes():
     glColor3f(1, 1, 0)
-    gap = 100
-    count = int(t_len * 2 / gap) + 5
+    gap = DASH_GAP
+    count = int(TRACK_LEN * 2 / gap) + 5
 
+    glBegin(GL_QUADS)
     for i in range(count):
-        y = (i * gap) - t_len - (track_scroll % gap)
-
-        glBegin(GL_QUADS)
-        glVertex3f(-LANE_W/2 - 2, y, 1)
-        glVertex3f(-LANE_W/2 + 2, y, 1)
-        glVertex3f(-LANE_W/2 + 2, y + gap/2, 1)
-        glVertex3f(-LANE_W/2 - 2, y + gap/2, 1)
-        glEnd()
-
-        glBegin(GL_QUADS)
-        glVertex3f( LANE_W/2 - 2, y, 1)
-        glVertex3f( LANE_W/2 + 2, y, 1)
-        glVertex3f( LANE_W/2 + 2, y + gap/2, 1)
-        glVertex3f( LANE_W/2 - 2, y + gap/2, 1)
-        glEnd()
-
-def draw_coin(x, y, z, kind="normal"):
-    glPushMatrix()
-    glTranslatef(x, y, z)
-    if kind == "double":
-        glColor3f(1, 1, 0)
-    else:
-        glColor3f(0.9,0.9,0.9)
-    gluSphere(gluNewQuadric(), 10, 10, 10)
-    glPopMatrix()
+        y = (i * gap) - TRACK_LEN
+        for lx in (-LANE_W/2, LANE_W/2):
+            glVertex3f(lx - 2, y, 1)
+            glVertex3f(lx + 2, y, 1)
+            glVertex3f(lx + 2, y + gap/2, 1)
+            glVertex3f(lx - 2, y + gap/2, 1)
+    glEnd()
 
 
-def draw_magnet(x, y, z):
-    glPushMatrix()
-    glTranslatef(x, y, z)
+# Render queue: the draw_* functions submit (material, mesh, transform)
+# items and render_world() runs them sorted by material and mesh.
+# Priorities only matter under a draw budget (higher numbers drop first).
+render_queue = RenderQueue()
+render_queue.register('lists', ListPass())
+render_queue.register('call', CallPass())
+OWN_COLOURS = ('lists', ())      # display lists that set their own colours
+PRI_WORLD, PRI_PICKUPS, PRI_SCENERY = 0, 1, 2
 
-    glColor3f(1, 0.4, 0.8)
-    glPushMatrix()
+
+def draw_ground():
+    render_queue.submit(OWN_COLOURS, scenery_list('ground', build_ground))
+    if quality.barriers:
+        render_queue.submit(OWN_COLOURS, scenery_list('barriers', build_barriers))
+
+
+def spaced(t):
+    """Mask of the tree rows `t` kept by the quality's tree_spacing."""
+    row = np.rint((t[..., 1] - scene.track_chunks.origin) / TREE_STEP).astype(int)
+    return row % quality.tree_spacing == 0
+
+
+def visible_trees():
+    """(ids, table rows) of the chunk trees inside the view frustum."""
+    live = scene.track_chunks.live()
+    t = scene.track_chunks.trees[live].reshape(-1, 4)
+    ids = (scene.track_chunks.ids[live, None] * TREES_PER_CHUNK + np.arange(TREES_PER_CHUNK)).ravel()
+    if quality.tree_spacing > 1 or quality.tree_rows:
+        keep = spaced(t)
+        if quality.tree_rows:
+            keep &= t[:, 1] - view_scroll < quality.tree_rows * TREE_STEP
+        t, ids = t[keep], ids[keep]
+    # one sphere around trunk and crown (crown radius t[:, 3], centred
+    # t[:, 3]/2 above the trunk top)
+    top = t[:, 2] + 1.5 * t[:, 3]
+    centres = np.column_stack((t[:, 0], t[:, 1] - view_scroll, top / 2))
+    shown = cull(centres, np.hypot(top / 2, t[:, 3]))
+    return ids[shown], t[shown]
+
+
+def chunk_spheres(slots):
+    """Bounding spheres (view centres, radii) of the trees of ring slots."""
+    t = scene.track_chunks.trees[slots]
+    r = t[..., 3]
+    # box around every trunk and crown of the chunk, from the ground up
+    lo = np.stack((t[..., 0] - r, t[..., 1] - r), -1).min(axis=1)
+    hi = np.stack((t[..., 0] + r, t[..., 1] + r), -1).max(axis=1)
+    top = (t[..., 2] + 1.5 * r).max(axis=1)
+    centres = np.column_stack(((lo + hi) / 2, top / 2))
+    centres[:, 1] -= view_scroll
+    return centres, np.hypot(np.hypot(*(hi - lo).T), top) / 2
+
+
+def chunk_trees_list(slot, day_k, level):
+    """Display list of one ring slot's trees at the current tree spacing and
+    crown `level`, rebuilt when the slot is recycled."""
+    chunk_id = scene.track_chunks.ids[slot]
+    key = (slot, day_k, quality.tree_spacing, level)
+    held = chunk_lists.get(key)
+    if held is not None and held[0] == chunk_id:
+        return held[1]
+    lst = held[1] if held is not None else glGenLists(1)
+    table = scene.track_chunks.trees[slot]
+    glNewList(lst, GL_COMPILE)
+    build_trees(table[spaced(table)], scene.track_chunks.start(scene.track_chunks.numbers[slot]),
+                day_k, *CROWN_LODS[level])
+    glEndList()
+    chunk_lists[key] = (chunk_id, lst)
+    return lst
+
+
+def chunk_crown_levels(slots):
+    """Crown level per ring slot: the finest any of its spaced trees needs."""
+    t = scene.track_chunks.trees[slots]
+    ids = scene.track_chunks.ids[slots, None] * TREES_PER_CHUNK + np.arange(TREES_PER_CHUNK)
+    keep = spaced(t)
+    t = t[keep]
+    centres = np.column_stack((t[:, 0], t[:, 1] - view_scroll, t[:, 2] + t[:, 3] / 2))
+    level = np.full(keep.shape, len(CROWN_LODS) - 1)
+    level[keep] = crown_lod.select(ids[keep], centres, t[:, 3], view_eye)
+    return level.min(axis=1)
+
+
+def draw_trees():
+    global tree_shown, tree_levels
+    day_k = 1.0 if scene.is_day else 0.4
+    r = get_instancer()
+    if r:
+        ids, t = visible_trees()
+        if not len(ids):
+            return
+        crown_centres = np.column_stack((t[:, 0], t[:, 1] - view_scroll, t[:, 2] + t[:, 3] / 2))
+        level = crown_lod.select(ids, crown_centres, t[:, 3], view_eye)
+        # instances keep world y and scroll with the batch shift, so they are
+        # only re-uploaded when trees cross the frustum edges or change level
+        moved = tree_shown is None or not np.array_equal(ids, tree_shown)
+        if moved:
+            trunks = instance_array(len(t))
+            trunks[:, 0:2] = t[:, 0:2]
+            trunks[:, 2] = t[:, 2] / 2
+            trunks[:, 3:5] = 3
+            trunks[:, 5] = t[:, 2]
+            trunks[:, 6:9] = (0.4, 0.2, 0.1)
+            r.upload('tree_trunks', trunks)
+        if moved or not np.array_equal(level, tree_levels):
+            # the mesh is a unit sphere, so scale by the crown radius
+            crowns = instance_array(len(t))
+            crowns[:, 0:2] = t[:, 0:2]
+            crowns[:, 2] = t[:, 2] + t[:, 3] / 2
+            crowns[:, 3:6] = t[:, 3:4]
+            crowns[:, 6:9] = (0.1, 0.6, 0.1)
+            for k in range(len(CROWN_LODS)):
+                r.upload(f'tree_crowns{k}', crowns[level == k])
+        tree_shown, tree_levels = ids, level
+        tint = ('instanced', (day_k,) * 3)
+        shift = (0, -view_scroll, 0)
+        render_queue.submit(tint, 'cube', ('tree_trunks', shift), PRI_SCENERY)
+        for k in range(len(CROWN_LODS)):
+            if (level == k).any():
+                render_queue.submit(tint, f'crown{k}', (f'tree_crowns{k}', shift), PRI_SCENERY)
+        return
+
+    # compiled per chunk, so rows are dropped and crowns coarsened a whole
+    # chunk at a time
+    slots = np.flatnonzero(scene.track_chunks.live())
+    if quality.tree_rows:
+        y0 = scene.track_chunks.start(scene.track_chunks.numbers[slots])
+        slots = slots[y0 - view_scroll < quality.tree_rows * TREE_STEP]
+    slots = slots[cull(*chunk_spheres(slots))]
+    for slot, level in zip(slots.tolist(), chunk_crown_levels(slots).tolist()):
+        y0 = scene.track_chunks.start(scene.track_chunks.numbers[slot])
+        render_queue.submit(OWN_COLOURS, chunk_trees_list(slot, day_k, level),
+                            (0, y0 - view_scroll, 0), PRI_SCENERY)
+
+
+def draw_track():
+    render_queue.submit(OWN_COLOURS, scenery_list('track', build_track))
+    if quality.dashes:
+        render_queue.submit(OWN_COLOURS, scenery_list('dashes', build_dashes),
+                            (0, -(view_scroll % DASH_GAP), 0))
+
+
+def draw_coin(x, y, z, kind="normal", level=0):
+    rgb = (1, 1, 0) if kind == "double" else (0.9, 0.9, 0.9)
+    render_queue.submit(('lists', rgb), mesh_cache.sphere_list(10, *COIN_LODS[level]),
+                        (x, y, z), PRI_PICKUPS)
+
+
+def build_magnet_body(slices, stacks):
     glRotatef(90, 1, 0, 0)
-    gluCylinder(gluNewQuadric(), 4, 4, 12, 8, 8)
-    glPopMatrix()
+    mesh_cache.cylinder(4, 4, 12, slices, stacks)
 
-    glPushMatrix()
-    glTranslatef(0, -6, 0)
-    glColor3f(1, 0, 0)
-    gluCylinder(gluNewQuadric(), 4.5, 4.5, 2, 8, 8)
-    glPopMatrix()
 
-    glPushMatrix()
-    glTranslatef(0, 6, 0)
-    glColor3f(0, 0, 1)
-    gluCylinder(gluNewQuadric(), 4.5, 4.5, 2, 8, 8)
-    glPopMatrix()
+def build_magnet_cap(dy, slices, stacks):
+    glTranslatef(0, dy, 0)
+    mesh_cache.cylinder(4.5, 4.5, 2, slices, stacks)
 
-    glColor3f(0.8, 0.8, 0.8)
+
+def build_magnet_rays():
     glBegin(GL_LINES)
     for i in range(8):
         ang = i * 45
@@ -308,50 +419,79 @@ def draw_magnet(x, y, z):
         glVertex3f(x2, 0, z2)
     glEnd()
 
-    glPopMatrix()
+
+def draw_magnet(x, y, z, level=0):
+    slices, stacks = MAGNET_LODS[level]
+    pos = (x, y, z)
+    body = mesh_cache.list(('magnet_body', level), lambda: build_magnet_body(slices, stacks))
+    cap_s = mesh_cache.list(('magnet_cap', -6, level), lambda: build_magnet_cap(-6, slices, stacks))
+    cap_n = mesh_cache.list(('magnet_cap', 6, level), lambda: build_magnet_cap(6, slices, stacks))
+    rays = mesh_cache.list(('magnet_rays',), build_magnet_rays)
+    render_queue.submit(('lists', (1, 0.4, 0.8)), body, pos, PRI_PICKUPS)
+    render_queue.submit(('lists', (1, 0, 0)), cap_s, pos, PRI_PICKUPS)
+    render_queue.submit(('lists', (0, 0, 1)), cap_n, pos, PRI_PICKUPS)
+    render_queue.submit(('lists', (0.8, 0.8, 0.8)), rays, pos, PRI_PICKUPS)
 
 
 def draw_obstacle(x, y, z, kind="normal"):
-    glPushMatrix()
-    glTranslatef(x, y, z)
-    if kind == "life":
-        glColor3f(0, 0, 0)
-    else:
-        glColor3f(1, 0, 0)
-    glutSolidCube(20)
-    glPopMatrix()
+    rgb = (0, 0, 0) if kind == "life" else (1, 0, 0)
+    render_queue.submit(('lists', rgb), mesh_cache.cube_list(20), (x, y, z))
 
 
-def draw_runner():
-    glPushMatrix()
-    # Position character at current lane and forward position
-    glTranslatef(runner_side, runner_forward, 20)
+# Pre-built runner mesh posed by a bone palette (None until the first frame,
+# False when shaders are unavailable and draw_runner falls back to immediate mode)
+runner_model = None
 
+
+def runner_pose():
     # animation phase for running motion
-    phase = (track_scroll * anim_curr) % (2 * math.pi)
+    phase = (view_scroll * scene.anim_curr) % (2 * math.pi)
     leg_stride = math.sin(phase) * 4          # Leg movement
     arm_swing = math.sin(phase + math.pi) * ARM_SWING_MAX  # Arms opposite to legs
+    return leg_stride, arm_swing
+
+
+def draw_runner():
+    render_queue.submit(('call',), 'runner', render_runner)
+
+
+def render_runner():
+    global runner_model
+    if runner_model is None:
+        runner_model = RunnerModel.create() or False
+
+    leg_stride, arm_swing = runner_pose()
+    glPushMatrix()
+    # Position character at current lane and forward position
+    glTranslatef(view_side, scene.runner_forward, 20)
+
+    if runner_model:
+        runner_model.pose(leg_stride, arm_swing)
+        runner_model.draw(scene.is_day)
+        glPopMatrix()
+        return
+
     # character drawing
     glPushMatrix()
-    if is_day:
+    if scene.is_day:
         glColor3f(0, 0.5, 1)      # Blue shirt in daylight
     else:
         glColor3f(0.4, 0.4, 0.4)  # Gray shirt at night
     glScalef(1.2, 0.8, 1.8)       # Make rectangular torso
-    glutSolidCube(15)
+    mesh_cache.cube(15)
     glPopMatrix()
 
     
     glPushMatrix()
     glTranslatef(0, 0, 18)
     glColor3f(1, 0.8, 0.6)        # Skin color
-    gluSphere(gluNewQuadric(), 8, 10, 10)
+    mesh_cache.sphere(8, 10, 10)
     glPopMatrix()
 
     glPushMatrix()
     glTranslatef(0, 0, 25)
     glColor3f(0.3, 0.2, 0.1)
-    gluSphere(gluNewQuadric(), 8.5, 8, 8)
+    mesh_cache.sphere(8.5, 8, 8)
     glPopMatrix()
 
     base_bias = -5.0
@@ -360,7 +500,7 @@ def draw_runner():
     glRotatef(base_bias + arm_swing, 1, 0, 0)
     glRotatef(90, 1, 0, 0)
     glColor3f(1, 0.8, 0.6)
-    gluCylinder(gluNewQuadric(), 2, 2, 12, 8, 8)
+    mesh_cache.cylinder(2, 2, 12, 8, 8)
     glPopMatrix()
 
     glPushMatrix()
@@ -368,7 +508,7 @@ def draw_runner():
     glRotatef(base_bias - arm_swing, 1, 0, 0)
     glRotatef(90, 1, 0, 0)
     glColor3f(1, 0.8, 0.6)
-    gluCylinder(gluNewQuadric(), 2, 2, 12, 8, 8)
+    mesh_cache.cylinder(2, 2, 12, 8, 8)
     glPopMatrix()
 
     hip_z = -13.5
@@ -378,22 +518,22 @@ def draw_runner():
     glTranslatef(-5, 0, hip_z)
     glRotatef(leg_stride, 1, 0, 0)
     glRotatef(180, 1, 0, 0)
-    if is_day:
+    if scene.is_day:
         glColor3f(0.2, 0.2, 0.8)
     else:
         glColor3f(0.1, 0.1, 0.1)
-    gluCylinder(gluNewQuadric(), 3, 3, leg_h, 8, 8)
+    mesh_cache.cylinder(3, 3, leg_h, 8, 8)
     glPopMatrix()
 
     glPushMatrix()
     glTranslatef(5, 0, hip_z)
     glRotatef(-leg_stride, 1, 0, 0)
     glRotatef(180, 1, 0, 0)
-    if is_day:
+    if scene.is_day:
         glColor3f(0.2, 0.2, 0.8)
     else:
         glColor3f(0.1, 0.1, 0.1)
-    gluCylinder(gluNewQuadric(), 3, 3, leg_h, 8, 8)
+    mesh_cache.cylinder(3, 3, leg_h, 8, 8)
     glPopMatrix()
 
     foot_z = hip_z - leg_h - 1.0
@@ -401,356 +541,300 @@ def draw_runner():
     glTranslatef(-5, 2, foot_z)
     glColor3f(0.1, 0.1, 0.1)
     glScalef(0.8, 1.2, 0.4)
-    glutSolidCube(6)
+    mesh_cache.cube(6)
     glPopMatrix()
 
     glPushMatrix()
     glTranslatef(5, 2, foot_z)
     glColor3f(0.1, 0.1, 0.1)
     glScalef(0.8, 1.2, 0.4)
-    glutSolidCube(6)
+    mesh_cache.cube(6)
     glPopMatrix()
 
     glPopMatrix()
 
 
 
+# Instanced rendering: one draw per mesh type instead of one per object.
+# Falls back to the immediate-mode draw_* functions if the context can't do it.
+instancer = None                 # InstancedRenderer, or False when unsupported
+
+
+WHITE = ('instanced', (1.0, 1.0, 1.0))   # untinted instanced material
+
+
+def get_instancer():
+    global instancer
+    if instancer is None:
+        instancer = InstancedRenderer.create() or False
+        if instancer:
+            for k, (slices, stacks) in enumerate(COIN_LODS):
+                instancer.add_mesh(f'coin{k}', meshes.sphere(1, slices, stacks))
+            for k, (slices, stacks) in enumerate(CROWN_LODS):
+                instancer.add_mesh(f'crown{k}', meshes.sphere(1, slices, stacks))
+            instancer.add_mesh('cube', meshes.cube(1))
+            for k, (slices, stacks) in enumerate(MAGNET_LODS):
+                body = meshes.cylinder(4, 4, 12, slices, stacks).transformed(rot_x=90)
+                cap = meshes.cylinder(4.5, 4.5, 2, slices, stacks)
+                instancer.add_mesh(f'magnet_body{k}', body)
+                instancer.add_mesh(f'magnet_cap_s{k}', cap.transformed(offset=(0, -6, 0)))
+                instancer.add_mesh(f'magnet_cap_n{k}', cap.transformed(offset=(0, 6, 0)))
+            instancer.add_mesh('magnet_rays', meshes.rays(15, 20, 8))
+            render_queue.register('instanced', InstancedPass(instancer))
+    return instancer
+
+
+def entity_instances(store, size, rgb, shown):
+    n = store.n
+    inst = instance_array(int(np.count_nonzero(shown)))
+    inst[:, 0] = store.x[:n][shown]
+    inst[:, 1] = store.y[:n][shown]
+    inst[:, 2] = store.z[:n][shown]
+    inst[:, 3:6] = size
+    inst[:, 6:9] = rgb[store.type[:n][shown]] if rgb.ndim == 2 else rgb
+    return inst
+
+
+# bounding sphere radii for the frustum test
+COIN_BOUND = 10
+OB_BOUND = 20 * math.sqrt(3) / 2
+MG_BOUND = 20                    # the field lines reach out 20
+
+
+def cull(centres, radii):
+    """Mask of the spheres inside the view frustum; counts go to the profiler."""
+    shown = frustum.visible(centres, radii)
+    n = int(np.count_nonzero(shown))
+    profiler.tally('visible', n)
+    profiler.tally('culled', len(shown) - n)
+    return shown
+
+
+def visible_rows(store, radius):
+    """(mask of rows in view, centres of those rows)."""
+    n = store.n
+    centres = np.column_stack((store.x[:n], store.y[:n] + view_shift, store.z[:n]))
+    shown = cull(centres, radius)
+    return shown, centres[shown]
+
+
+# Level of detail: tessellations per primitive, finest first, picked by
+# projected size (--lod-bias below 1 drops detail sooner, for llvmpipe).
+# Nothing is lit, so the coarser cylinders need only one stack.
+COIN_LODS = ((10, 10), (8, 6), (6, 4))
+CROWN_LODS = ((8, 8), (6, 5), (5, 4))
+MAGNET_LODS = ((8, 8), (6, 1), (4, 1))
+lod_policy = LodPolicy(fov_y=FOV_Y)
+coin_lod = LodState(lod_policy)
+magnet_lod = LodState(lod_policy)
+crown_lod = LodState(lod_policy)
+
+# Quality levels, lowest first; with --adaptive a QualityGovernor moves
+# between them to hold TARGET_FPS.
+#   tree_rows     rows of trees drawn ahead of the runner (None: all in view)
+#   tree_spacing  draw every n-th row of trees
+#   lod_scale     multiplies the --lod-bias for coins, crowns and magnets
+#   barriers      draw the barriers along the track
+#   dashes        draw the lane dashes
+#   hud_every     update changed HUD text every n-th frame
+Quality = namedtuple('Quality', 'tree_rows tree_spacing lod_scale barriers dashes hud_every')
+QUALITY_LEVELS = (
+    Quality(3, 2, 0.35, False, False, 6),
+    Quality(5, 2, 0.5, True, False, 4),
+    Quality(8, 1, 0.75, True, True, 2),
+    Quality(None, 1, 1.0, True, True, 1),
+)
+quality = QUALITY_LEVELS[-1]
+governor = None
+lod_bias = lod_policy.bias       # before the quality's lod_scale
+
+
+def set_quality(q):
+    global quality
+    quality = q
+    lod_policy.bias = lod_bias * q.lod_scale
+
+
 def draw_all_coins():
-    for c in coins:
-        draw_coin(c['x'], c['y'], c['z'], c.get('type', 'normal'))
+    shown, centres = visible_rows(scene.coins, COIN_BOUND)
+    if not shown.any():
+        return
+    level = coin_lod.select(scene.coins.uid[:scene.coins.n][shown], centres, COIN_BOUND, view_eye)
+    r = get_instancer()
+    if not r:
+        for (x, y, z, t), k in zip(itertools.compress(scene.coins.rows(), shown), level.tolist()):
+            draw_coin(x, y + view_shift, z, COIN_KINDS[t], k)
+        return
+    inst = entity_instances(scene.coins, 10, COIN_RGB, shown)
+    for k in range(len(COIN_LODS)):
+        at = level == k
+        if at.any():
+            r.upload(f'coins{k}', inst[at])
+            render_queue.submit(WHITE, f'coin{k}', (f'coins{k}', (0, view_shift, 0)), PRI_PICKUPS)
 
 
 def draw_all_magnets():
-    for m in magnets:
-        draw_magnet(m['x'], m['y'], m['z'])
+    shown, centres = visible_rows(scene.magnets, MG_BOUND)
+    if not shown.any():
+        return
+    level = magnet_lod.select(scene.magnets.uid[:scene.magnets.n][shown], centres, MG_BOUND, view_eye)
+    r = get_instancer()
+    if not r:
+        for (x, y, z, _), k in zip(itertools.compress(scene.magnets.rows(), shown), level.tolist()):
+            draw_magnet(x, y + view_shift, z, k)
+        return
+    shift = (0, view_shift, 0)
+    inst = entity_instances(scene.magnets, 1, np.ones(3, np.float32), shown)
+    for k in range(len(MAGNET_LODS)):
+        at = level == k
+        if at.any():
+            r.upload(f'magnets{k}', inst[at])
+            batch = (f'magnets{k}', shift)
+            render_queue.submit(('instanced', (1, 0.4, 0.8)), f'magnet_body{k}', batch, PRI_PICKUPS)
+            render_queue.submit(('instanced', (1, 0, 0)), f'magnet_cap_s{k}', batch, PRI_PICKUPS)
+            render_queue.submit(('instanced', (0, 0, 1)), f'magnet_cap_n{k}', batch, PRI_PICKUPS)
+    r.upload('magnets', inst)
+    render_queue.submit(('instanced', (0.8, 0.8, 0.8)), 'magnet_rays', ('magnets', shift), PRI_PICKUPS)
 
 
 def draw_all_obstacles():
-    for o in obstacles:
-        draw_obstacle(o['x'], o['y'], o['z'], o.get('type', 'normal'))
-
-
-
-
-#spawn
-def spot_ok(nx, ny, is_ob=False, is_coin=False, is_mg=False):
-    min_gap = 150
-    coin_gap = 100
-
-    for ob in obstacles:
-        if abs(ob['y'] - ny) < min_y_gap and ob['x'] == nx:
-            return False
-
-    if is_coin or is_ob or is_mg:
-        for c in coins:
-            d = math.hypot(c['x'] - nx, c['y'] - ny)
-            if d < coin_gap:
-                return False
-
-    if is_coin or is_ob or is_mg:
-        for m in magnets:
-            d = math.hypot(m['x'] - nx, m['y'] - ny)
-            if d < min_gap:
-                return False
-
-    if is_ob:
-        nearby = []
-        for ob in obstacles:
-            if abs(ob['y'] - ny) < min_gap:
-                nearby.append(ob['x'])
-        blocked = set(nearby + [nx])
-        if len(blocked) >= 3:
-            return False
-
-    return True
-
-
-def emit_coin():
-    tries = 0
-    while tries < 15:
-        lane = random.randint(0, 2)                    # Pick random lane
-        x = LANE_X[lane]
-        y = runner_forward + 300 + random.randint(50, 250)  # Spawn ahead of player
-        z = 20
-
-        # coin type: normal (1 point) or double (2 points)
-        kind = "double" if random.random() < coin_double_prob else "normal"
-
-        # Check if position doesn't overlap with other objects
-        if spot_ok(x, y, is_coin=True):
-            coins.append({'x': x, 'y': y, 'z': z, 'type': kind})
-            return
-        tries += 1
-
-
-def emit_obstacles():
-    tries = 0
-    while tries < 15:
-        how_many = random.randint(1, 2)
-
-        recent = [ob['x'] for ob in obstacles[-6:]]
-        use = {
-            LANE_X[0]: recent.count(LANE_X[0]),
-            LANE_X[1]: recent.count(LANE_X[1]),
-            LANE_X[2]: recent.count(LANE_X[2]),
-        }
-        lanes_sorted = sorted(use.keys(), key=lambda k: use[k])
-
-        if how_many == 1:
-            if random.random() < 0.6:
-                chosen = [lanes_sorted[0]]
-            else:
-                chosen = [random.choice(LANE_X)]
-        else:
-            if random.random() < 0.7:
-                chosen = lanes_sorted[:2]
-            else:
-                chosen = random.sample(LANE_X, 2)
-
-        ok = True
-        newlist = []
-        base_y = runner_forward + 400 + random.randint(50, 150)
-        for lane_x in chosen:
-            x = lane_x
-            y = base_y + random.randint(-20, 20)
-            z = 10
-            kind = "life" if random.random() < 0.25 else "normal"
-            if not spot_ok(x, y, is_ob=True):
-                ok = False
-                break
-            newlist.append({'x': x, 'y': y, 'z': z, 'type': kind})
-
-        occ = [o['x'] for o in newlist]
-        free = [p for p in LANE_X if p not in occ]
-
-        if ok and newlist and len(free) > 0:
-            obstacles.extend(newlist)
-            return
+    shown, _ = visible_rows(scene.obstacles, OB_BOUND)
+    if not shown.any():
+        return
+    r = get_instancer()
+    if not r:
+        for (x, y, z, t), vis in zip(scene.obstacles.rows(), shown):
+            if vis:
+                draw_obstacle(x, y + view_shift, z, OB_KINDS[t])
+        return
+    r.upload('obstacles', entity_instances(scene.obstacles, 20, OB_RGB, shown))
+    render_queue.submit(WHITE, 'cube', ('obstacles', (0, view_shift, 0)))
 
-        tries += 1
 
 
-def emit_magnet():
-    tries = 0
-    while tries < 15:
-        lane = random.randint(0, 2)
-        x = LANE_X[lane]
-        y = runner_forward + 350 + random.randint(50, 200)
-        z = 25
-        if spot_ok(x, y, is_mg=True):
-            magnets.append({'x': x, 'y': y, 'z': z})
-            return
-        tries += 1
-
-
-def update_daynight():
-    global bg_rgb, is_day, is_transitioning, trans_dir
-    if is_transitioning:
-        if trans_dir == 1:
-            bg_rgb[0] = min(0.5, bg_rgb[0] + trans_step)
-            bg_rgb[1] = min(0.8, bg_rgb[1] + trans_step * 2)
-            bg_rgb[2] = min(1.0, bg_rgb[2] + trans_step * 3)
-            if bg_rgb[2] >= 1.0:
-                is_day = True
-                is_transitioning = False
-        elif trans_dir == -1:
-            bg_rgb[0] = max(0.05, bg_rgb[0] - trans_step)
-            bg_rgb[1] = max(0.05, bg_rgb[1] - (trans_step * 2))
-            bg_rgb[2] = max(0.08, bg_rgb[2] - (trans_step * 2))
-            if bg_rgb[1] <= 0.05:
-                is_day = False
-                is_transitioning = False
-
-
-def update_coins():
-    global points, coins
-    for c in coins[:]:
-        # Move coins toward player
-        c['y'] -= game_speed
-
-        # Remove coins that are behind the player
-        if c['y'] < runner_forward - 50:
-            coins.remove(c)
-            continue
-
-        # Magnetic attraction when magnet power-up is active
-        if mag_on:
-            dx = runner_side - c['x']
-            dy = runner_forward - c['y']
-            dz = 20 - c['z']
-            dist = math.sqrt(dx*dx + dy*dy + dz*dz)
-            if dist < mag_radius:        # Within magnetic field
-                if dist > 0:
-                    kx = dx / dist * mag_pull
-                    ky = dy / dist * mag_pull
-                    kz = dz / dist * mag_pull
-                    c['x'] += kx
-                    c['y'] += ky
-                    c['z'] += kz
-                if dist < coin_pick_radius:
-                    if c.get('type', 'normal') == "double":
-                        points += 2
-                        print(f"Magnet collected double coin! +2 points. Total points: {points}")
-                    else:
-                        points += 1
-                        print(f"Magnet collected coin! +1 point. Total points: {points}")
-                    coins.remove(c)
-                continue
-
-        d = math.sqrt((c['x'] - runner_side)**2 + (c['y'] - runner_forward)**2 + (c['z'] - 20)**2)
-        if d < coin_pick_radius:
-            if c.get('type', 'normal') == "double":
-                points += 2
-                print(f"Double coin collected! +2 points. Total points: {points}")
-            else:
-                points += 1
-                print(f"Coin collected! +1 point. Total points: {points}")
-            coins.remove(c)
-
-
-def update_obstacles():
-    global is_running, obstacles, lives
-    for o in obstacles[:]:
-        # Move obstacles toward player
-        o['y'] -= game_speed
-        if o['y'] < runner_forward - 50:
-            obstacles.remove(o)
-            continue
-
-        # Check collision with player
-        d = math.sqrt((o['x'] - runner_side)**2 + (o['y'] - runner_forward)**2 + (o['z'] - 10)**2)
-        if d < hit_radius:
-            if o.get('type', 'normal') == "life":
-                lives -= 1
-                print(f"Black box hit! Life remaining: {lives}")
-                obstacles.remove(o)
-                if lives <= 0:
-                    is_running = False
-                    print(f"Game Over! Final points: {points}")
-                    break
-            else:
-                is_running = False
-                print(f"Game Over! Final points: {points}")
-                break
-
-
-def update_magnets():
-    global magnets, mag_on, mag_time_left
-    for m in magnets[:]:
-        m['y'] -= game_speed
-        if m['y'] < runner_forward - 50:
-            magnets.remove(m)
-            continue
-
-        d = math.sqrt((m['x'] - runner_side)**2 + (m['y'] - runner_forward)**2 + (m['z'] - 20)**2)
-        if d < mag_pick_radius:
-            magnets.remove(m)
-            mag_on = True
-            mag_time_left += mag_seconds
-            print(f"Magnet collected! Active for {mag_time_left:.1f} more seconds")
-
 
 def update_game():
-    global runner_side, runner_side_goal, track_scroll, score, meters, game_speed, t_start
-    global coin_t, ob_t, mg_t, anim_curr, mag_on, mag_time_left
-
-    if not is_running or t_start is None:
-        return
+    """Run as many fixed TICK steps as the wall clock has accumulated."""
+    global t_last, sim_accum, render_alpha
+
+    if session.replay_queue:
+        session.apply_due_inputs()
+    if not session.is_running or t_start is None:
+        t_last = None            # stopped time is not simulated on resume
+        return 0
+
+    now = time.perf_counter()
+    if t_last is not None:
+        sim_accum += min(now - t_last, MAX_FRAME_DT)
+    t_last = now
+
+    steps = 0
+    while sim_accum >= TICK and session.is_running:
+        session.step(TICK)
+        sim_accum -= TICK
+        steps += 1
+        if session.replay_queue:
+            session.apply_due_inputs()
+        if steps == MAX_STEPS_PER_FRAME:
+            sim_accum = 0.0
+            break
+    render_alpha = min(sim_accum / TICK, 1.0) if session.is_running else 1.0
+    return steps
+
+
+def update_view():
+    # blend the last two ticks so motion is smooth at any frame rate
+    global view_side, view_scroll, view_shift
+    a = render_alpha
+    if sim_thread and scene.is_running:
+        # how far the wall clock is past the tick the frame shows
+        a = min((time.perf_counter() - scene.time) / TICK, 1.0)
+    view_side = scene.prev_runner_side + (scene.runner_side - scene.prev_runner_side) * a
+    view_scroll = scene.prev_track_scroll + (scene.track_scroll - scene.prev_track_scroll) * a
+    view_shift = (1 - a) * scene.last_move
+
+
+def on_sim(fn, *args):
+    # anything that touches the session runs where the simulation does
+    if sim_thread:
+        sim_thread.call(fn, *args)
+    else:
+        fn(*args)
 
-    # distance traveled (time-based)
-    now = time.time()
-    meters = now - t_start
 
-    # Smooth lane switching animation
-    diff = runner_side_goal - runner_side
-    if abs(diff) > 0.5:
-        runner_side += diff * 0.15      # Interpolate to target position
-    else:
-        runner_side = runner_side_goal
+def request_redraw():
+    global needs_redraw, hud_stale
+    needs_redraw = True
+    hud_stale = True
 
-    # track scrolling effect
-    track_scroll += game_speed
 
-    # Gradually increase game speed
-    speed_gain = min(meters / 15.0, max_speed - base_speed)
-    game_speed = base_speed + speed_gain * 0.7
+def save_recording(path):
+    log = session.input_log
+    log.append((session.tick_no, 'E'))
+    replay.save_log(path, log)
+    session.log(f"Wrote {len(log)} input events to {path}")
 
-    # Increase animation speed to match game speed
-    anim_gain = min(meters / 15.0, anim_max - anim_base)
-    anim_curr = anim_base + anim_gain * 0.7
 
-    # Update magnet power-up timer
-    if mag_on:
-        mag_time_left -= 0.016
-        if mag_time_left <= 0:
-            mag_on = False
-            mag_time_left = 0.0
-            print("Magnet effect ended")
+def view_input(event):
+    # replayed camera and view-mode input (see GameSession.view_input)
+    tick, kind, *args = event
+    request_redraw()
+    if kind == 'P':
+        move_camera(args[0])
+    else:
+        mouse(args[0], args[1], 0, 0)
 
-    score += 1
 
-    update_coins()
-    update_obstacles()
-    update_magnets()
-    update_daynight()
+session.view_input = view_input
 
-    coin_t += 0.016
-    if coin_t >= coin_period:
-        emit_coin()
-        coin_t = 0.0
 
-    ob_t += 0.016
-    if ob_t >= ob_period:
-        emit_obstacles()
-        ob_t = 0.0
+def set_profiling(on):
+    if on and not profiler.enabled:
+        mods = [sys.modules[name] for name in
+                (__name__, 'instancing', 'runner_model', 'meshcache', 'renderqueue',
+                 'hudlayer')]
+        # update phases are only timed when they run on this thread
+        owners = (sys.modules[__name__],) if sim_thread else (sys.modules[__name__], GameSession)
+        profiler.enable(owners, mods)
+        on_sim(session.log, "Profiler on")
+    elif not on and profiler.enabled:
+        profiler.disable()
+        on_sim(session.log, "Profiler off")
 
-    mg_t += 0.016
-    if mg_t >= mg_period:
-        emit_magnet()
-        mg_t = 0.0
 
+def dump_profile():
+    if profiler.count:
+        rows = profiler.dump_csv(profile_csv)
+        # straight to the bus: at exit the simulation thread is already stopped
+        session.log(f"Wrote {rows} frames to {profile_csv}")
 
 
 # Input handlers
 def keyboardListener(key, x, y):
-    global is_running, lane_idx, runner_side_goal, t_start, t_pause_begin
-    global is_transitioning, trans_dir, is_day
+    request_redraw()
 
-    # R key resets the game
+    # R key resets the game (and the frame clock)
     if key == b'r':
-        reset_game()
-        print("Game Reset!")
-        return
-
-    # Spacebar pauses/resumes the game
-    if key == b' ':
-        if is_running:
-            is_running = False
-            t_pause_begin = time.time()    # Track pause start time
-            print("Paused")
-        else:
-            # Resume: adjust timer to exclude pause duration
-            if t_pause_begin is not None and t_start is not None:
-                paused = time.time() - t_pause_begin
-                t_start += paused
-            is_running = True
-            t_pause_begin = None
-            print("Resumed")
-
-    if key == b'd':
-        if not is_day and not is_transitioning:
-            is_transitioning = True
-            trans_dir = 1
-            print("Transitioning to day...")
-    elif key == b'a':
-        if is_day and not is_transitioning:
-            is_transitioning = True
-            trans_dir = -1
-            print("Transitioning to night...")
+        on_sim(reset_game)
+        on_sim(session.log, "Game Reset!")
+    elif key == b'p':
+        set_profiling(not profiler.enabled)
+    elif key == b'c':
+        dump_profile()
+    else:
+        # space pauses/resumes, 'd'/'a' turn to day/night
+        on_sim(session.keyboard, key)
 
 
 def specialKeyListener(key, x, y):
-    global cam_pos, lane_idx, runner_side_goal, runner_side
+    request_redraw()
+    move_camera(key)
+    # Left/Right arrows switch lanes
+    on_sim(session.special, key)
+
+
+def move_camera(key):
+    global cam_pos
     cx, cy, cz = cam_pos
 
     # Up/Down arrows adjust camera height
@@ -759,55 +843,73 @@ def specialKeyListener(key, x, y):
     if key == GLUT_KEY_DOWN:
         cz -= 5                    # camera down
 
-    # Left/Right arrows switch lanes
-    if key == GLUT_KEY_LEFT:
-        if lane_idx > 0 and abs(runner_side - runner_side_goal) < 5:
-            lane_idx -= 1
-            runner_side_goal = LANE_X[lane_idx]
-            print(f"Switching to lane {lane_idx}")
-
-    if key == GLUT_KEY_RIGHT:
-        if lane_idx < 2 and abs(runner_side - runner_side_goal) < 5:
-            lane_idx += 1
-            runner_side_goal = LANE_X[lane_idx]
-            print(f"Switching to lane {lane_idx}")
-
     cam_pos = (cx, cy, cz)
 
 
-def mouse(button, state, x, y):
+def mouse(button, button_state, x, y):
     global is_fp
-    if button == GLUT_RIGHT_BUTTON and state == GLUT_DOWN:
+    if button == GLUT_RIGHT_BUTTON and button_state == GLUT_DOWN:
+        request_redraw()
         is_fp = not is_fp
         if is_fp:
-            print("Switched to First-Person View")
+            on_sim(session.log, "Switched to First-Person View")
         else:
-            print("Switched to Third-Person View")
+            on_sim(session.log, "Switched to Third-Person View")
+
+
+# GLUT adapters: record what the player does, or ignore it during a replay
+def on_keyboard(key, x, y):
+    if key not in UNRECORDED_KEYS:
+        if session.replay_queue:
+            return
+        on_sim(session.record_input, 'K', key[0])
+    keyboardListener(key, x, y)
+
+
+def on_special(key, x, y):
+    if session.replay_queue:
+        return
+    on_sim(session.record_input, 'P', key)
+    specialKeyListener(key, x, y)
+
+
+def on_mouse(button, button_state, x, y):
+    if session.replay_queue:
+        return
+    on_sim(session.record_input, 'M', button, button_state)
+    mouse(button, button_state, x, y)
 
 
 
 # Camera & render pipeline
 def setup_camera():
+    global frustum, view_eye
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(FOV_Y, 1.25, 0.1, 1500)
+    gluPerspective(FOV_Y, ASPECT, NEAR, FAR)
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
 
+    eye, target = camera_eye()
+    gluLookAt(*eye, *target, 0, 0, 1)
+    frustum = Frustum.for_camera(FOV_Y, ASPECT, NEAR, FAR, eye, target)
+    view_eye = np.array(eye, dtype=float)
+
+
+def camera_eye():
+    """(eye, target) for the current view mode."""
     cx, cy, cz = cam_pos
 
     if is_fp:
-        cam_x = runner_side
-        cam_y = runner_forward + 10
+        cam_x = view_side
+        cam_y = scene.runner_forward + 10
         cam_z = 10
     else:
-        cam_x = runner_side * 0.3
-        cam_y = runner_forward + cy
+        cam_x = view_side * 0.3
+        cam_y = scene.runner_forward + cy
         cam_z = cz
 
-    gluLookAt(cam_x, cam_y, cam_z,
-              runner_side * 0.5, runner_forward + 100, 10,
-              0, 0, 1)
+    return (cam_x, cam_y, cam_z), (view_side * 0.5, scene.runner_forward + 100, 10)
 
 
 def render_world():
@@ -818,51 +920,170 @@ def render_world():
     draw_all_coins()        
     draw_all_magnets()      
     draw_all_obstacles()    
+    flush_render_queue()
 
 
-def idle():
-    update_game()           
-    glutPostRedisplay()     
+def flush_render_queue():
+    render_queue.execute()
+    profiler.tally('draws', render_queue.draws)
+    profiler.tally('dropped', render_queue.dropped)
 
 
-def showScreen():
+def frame(value=0):
+    """glutTimerFunc callback: advance the simulation, redraw if needed, re-arm.
+
+    With a sim_thread the simulation advances by itself; frames are drawn
+    while it runs or has published something new.
+    """
+    global needs_redraw
+    t0 = time.perf_counter()
+    if profiler.enabled:
+        profiler.next_frame()
+
+    if sim_thread:
+        if sim_thread.frames.fresh or scene.is_running:
+            needs_redraw = True
+    elif update_game():
+        needs_redraw = True
+    if needs_redraw:
+        needs_redraw = False
+        glutPostRedisplay()
+
+    # sleep in the GLUT loop until the next frame is due
+    wait = 1.0 / TARGET_FPS - (time.perf_counter() - t0)
+    glutTimerFunc(max(1, int(wait * 1000)), frame, 0)
+
+
+def render_frame(hud=True):
+    # hud=False skips the GLUT bitmap text, for contexts made without GLUT
+    global scene
+    if sim_thread:
+        scene = sim_thread.frames.latest()
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     glLoadIdentity()
     glViewport(0, 0, 1000, 800)
     draw_bg()
 
     glEnable(GL_DEPTH_TEST)
+    update_view()
     setup_camera()
     render_world()
 
-    draw_text(10, 670, f"Distance Travelled: {meters:.1f}m")
-    draw_text(10, 640, f"Points: {points}")
-    draw_text(10, 610, f"Life: {lives}")
+    if hud:
+        draw_hud()
 
-    if mag_on:
-        draw_text(10, 580, f"Magnet: ACTIVE ({mag_time_left:.1f}s)")
-    else:
-        draw_text(10, 580, f"Magnet: INACTIVE")
 
-    draw_text(10, 550, f"Press 'r' to restart")
-    draw_text(10, 520, f"Gold coins = 2 points, Silver coins = 1 point")
-    draw_text(10, 490, f"'d' = day, 'a' = night")
-    draw_text(10, 460, f"Mode: {'DAY' if is_day else 'NIGHT'}")
-    draw_text(10, 490, f"")
+# HUD strings, reformatted only when the value changes at display precision
+hud_cache = {}                   # format -> (shown value, text)
+
+
+def hud_text(fmt, value):
+    cached = hud_cache.get(fmt)
+    if cached is None or cached[0] != value:
+        cached = hud_cache[fmt] = (value, fmt.format(value))
+    return cached[1]
+
 
-    if not is_running:
-        glColor3f(1, 1, 1)
-        draw_text(500, 400, "PAUSED")
-        if t_pause_begin is None:
-            draw_text(450, 350, "GAME OVER")
-            draw_text(430, 300, f"Final Points: {points}")
+# HUD layer (see hudlayer.py): None until the first frame, False when the
+# context has no framebuffer objects and the text is drawn every frame
+hud_layer = None
+hud_frames = 0                   # frames since the layer was last updated
+hud_stale = True                 # input since then: update on the next frame
+hud_run_state = None             # (is_running, paused) at the last update
+HUD_STATIC = (
+    (10, 550, "Press 'r' to restart"),
+    (10, 520, "Gold coins = 2 points, Silver coins = 1 point"),
+    (10, 490, "'d' = day, 'a' = night"),
+)
 
+
+def get_hud_layer():
+    global hud_layer
+    if hud_layer is None:
+        # draw_text is looked up per call so the profiler's wrapper sees it
+        hud_layer = HudLayer.create(1000, 800, lambda x, y, s: draw_text(x, y, s),
+                                    HUD_STATIC, ortho=(1200, 800)) or False
+    return hud_layer
+
+
+def hud_lines():
+    """The HUD lines that change, as (x, y, text)."""
+    lines = [
+        (10, 670, hud_text("Distance Travelled: {:.1f}m", round(scene.meters, 1))),
+        (10, 640, hud_text("Points: {}", scene.points)),
+        (10, 610, hud_text("Life: {}", scene.lives)),
+    ]
+    if scene.mag_on:
+        lines.append((10, 580, hud_text("Magnet: ACTIVE ({:.1f}s)", round(scene.mag_time_left, 1))))
+    else:
+        lines.append((10, 580, "Magnet: INACTIVE"))
+    lines.append((10, 460, "Mode: DAY" if scene.is_day else "Mode: NIGHT"))
+
+    if not scene.is_running:
+        lines.append((500, 400, "PAUSED"))
+        if not scene.paused:
+            lines.append((450, 350, "GAME OVER"))
+            lines.append((430, 300, hud_text("Final Points: {}", scene.points)))
+    return lines
+
+
+def draw_hud():
+    global hud_frames, hud_stale, hud_run_state
+    layer = get_hud_layer()
+    if layer:
+        # only the running counters wait for the n-th frame: once the game
+        # stops, frames are drawn only on input, and each has to show it
+        hud_frames += 1
+        run_state = (scene.is_running, scene.paused)
+        if (hud_frames >= quality.hud_every or hud_stale or not scene.is_running
+                or run_state != hud_run_state):
+            hud_frames = 0
+            hud_stale = False
+            hud_run_state = run_state
+            layer.update(hud_lines())
+        layer.draw()
+    else:
+        for x, y, s in HUD_STATIC + tuple(hud_lines()):
+            draw_text(x, y, s)
+
+    if profiler.enabled:
+        for i, line in enumerate(profiler.overlay_lines()):
+            draw_text(640, 770 - i * 18, line, GLUT_BITMAP_9_BY_15)
+
+
+def release_gl():
+    """Free every cached GL object; call while the context is still current."""
+    global instancer, runner_model, tree_shown, hud_layer
+    if instancer:
+        instancer.release()
+    if runner_model:
+        runner_model.release()
+    if hud_layer:
+        hud_layer.release()
+    instancer = runner_model = tree_shown = hud_layer = None
+    mesh_cache.release()
+    for lst in scenery_lists.values():
+        glDeleteLists(lst, 1)
+    scenery_lists.clear()
+    for _, lst in chunk_lists.values():
+        glDeleteLists(lst, 1)
+    chunk_lists.clear()
+
+
+def showScreen():
+    t0 = time.perf_counter()
+    render_frame()
+    if governor:
+        glFinish()                 # time the rasterising too, not just the calls
+        if governor.record(time.perf_counter() - t0):
+            set_quality(governor.quality)
+            on_sim(session.log, f"Quality level {governor.level}")
     glutSwapBuffers()
 
 
-def main():
+def main(seed=None, threaded=False, record=None):
     """Initialize OpenGL window and start the game"""
-    global t_start
+    global sim_thread
     # Initialize GLUT 
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)  
@@ -871,15 +1092,76 @@ def main():
     glutCreateWindow(b"3D Runner Game")                        
 
     glutDisplayFunc(showScreen)     
-    glutKeyboardFunc(keyboardListener)      
-    glutSpecialFunc(specialKeyListener)   
-    glutMouseFunc(mouse)       
-    glutIdleFunc(idle)         
-
-
-    t_start = time.time()
+    glutKeyboardFunc(on_keyboard)
+    glutSpecialFunc(on_special)
+    glutMouseFunc(on_mouse)
+    glutTimerFunc(0, frame, 0)
+
+    log_sink = LogSink()
+    session.bus.subscribe(log_sink)
+    # exit handlers run last-registered first: the sink closes after the
+    # ones below have logged
+    atexit.register(log_sink.close)
+    atexit.register(dump_profile)
+    if record:
+        atexit.register(save_recording, record)
+
+    reset_game(seed)
+    if threaded:
+        sim_thread = SimThread(session, TICK, MAX_STEPS_PER_FRAME)
+        sim_thread.start()
+        atexit.register(sim_thread.stop)
+    # everything allocated so far lives for the whole run; keep it out of
+    # the collector's way so full collections stay short
+    gc.freeze()
     glutMainLoop()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="3D Runner Game")
+    parser.add_argument("--headless", action="store_true",
+                        help="step the simulation without a window and print the result")
+    parser.add_argument("--ticks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--profile", action="store_true",
+                        help="start with the frame profiler on")
+    parser.add_argument("--profile-csv", default=profile_csv,
+                        help="where the profiler writes per-frame rows")
+    parser.add_argument("--lod-bias", type=float, default=lod_policy.bias,
+                        help="scale projected sizes for detail picks (<1 = coarser, faster)")
+    parser.add_argument("--quality", type=int, choices=range(len(QUALITY_LEVELS)),
+                        default=len(QUALITY_LEVELS) - 1,
+                        help="detail level, 0 (lowest) to %(default)s (full)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="drop or raise the quality level to hold TARGET_FPS")
+    parser.add_argument("--draw-budget", type=int, default=None,
+                        help="most draw calls per frame; scenery is dropped first")
+    parser.add_argument("--threaded", action="store_true",
+                        help="step the simulation on its own thread; frames draw its newest state")
+    parser.add_argument("--record", metavar="LOG",
+                        help="write this session's inputs to LOG on exit")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="play back a recorded session in the window")
+    args = parser.parse_args()
+    profile_csv = args.profile_csv
+    lod_bias = args.lod_bias
+    set_quality(QUALITY_LEVELS[args.quality])
+    if args.adaptive:
+        governor = QualityGovernor(QUALITY_LEVELS, TARGET_FPS)
+        governor.set_level(args.quality)
+    render_queue.budget = args.draw_budget
+
+    if args.headless:
+        t0 = time.perf_counter()
+        result = session.run(args.ticks, seed=args.seed)
+        took = time.perf_counter() - t0
+        print(result)
+        print(f"{result['ticks']} ticks in {took:.2f}s ({result['ticks'] / max(took, 1e-9):.0f} ticks/s)")
+    else:
+        if args.profile:
+            set_profiling(True)
+        if args.replay:
+            session.replay_queue.extend(replay.load_log(args.replay))
+        elif args.record:
+            session.input_log = []
+        main(args.seed, args.threaded, None if args.replay else args.record)
@@ -0,0 +1,126 @@
+"""Per-frame render queue.
+
+Draw code submits (material, mesh, transform) items instead of drawing.
+execute() sorts them by material, then mesh, and runs them through the
+pass registered for the material's kind (its first element), so every
+material is set up once and every mesh bound once per frame, whatever
+order things were submitted in.  The scene is opaque and depth tested,
+so the order does not change the picture.
+
+Passes implement begin(material), bind(mesh), draw(mesh, transform) and
+end(material).  Materials and meshes must be orderable within a kind.
+
+The queue is also where draw calls are counted and, with a `budget`,
+capped: the items with the highest `priority` number go first.
+"""
+from operator import itemgetter
+
+from OpenGL.GL import *
+
+
+class RenderQueue:
+
+    def __init__(self, budget=None):
+        self.items = []                  # (material, mesh, seq, transform, priority)
+        self.passes = {}
+        self.budget = budget
+        self.draws = 0                   # last execute(): items drawn,
+        self.dropped = 0                 # items over the budget,
+        self.materials = 0               # and material switches
+
+    def register(self, kind, draw_pass):
+        self.passes[kind] = draw_pass
+
+    def submit(self, material, mesh, transform=None, priority=0):
+        self.items.append((material, mesh, len(self.items), transform, priority))
+
+    def execute(self):
+        items = self.items
+        self.dropped = 0
+        if self.budget is not None and len(items) > self.budget:
+            items.sort(key=itemgetter(4, 2))
+            self.dropped = len(items) - self.budget
+            del items[self.budget:]
+        items.sort(key=itemgetter(0, 1, 2))
+
+        material = mesh = draw_pass = None
+        self.materials = 0
+        for m, mesh_key, _, transform, _ in items:
+            if m != material:
+                if draw_pass is not None:
+                    draw_pass.end(material)
+                material, mesh = m, None
+                draw_pass = self.passes[m[0]]
+                draw_pass.begin(m)
+                self.materials += 1
+            if mesh_key != mesh:
+                mesh = mesh_key
+                draw_pass.bind(mesh)
+            draw_pass.draw(mesh, transform)
+        if draw_pass is not None:
+            draw_pass.end(material)
+        self.draws = len(items)
+        items.clear()
+
+
+class ListPass:
+    """('lists', rgb) materials: display lists, optionally translated.
+
+    rgb is () for lists that set their own colours.
+    """
+
+    def begin(self, material):
+        if material[1]:
+            glColor3f(*material[1])
+
+    def bind(self, mesh):
+        pass
+
+    def draw(self, mesh, transform):
+        if transform is None:
+            glCallList(mesh)
+        else:
+            glPushMatrix()
+            glTranslatef(*transform)
+            glCallList(mesh)
+            glPopMatrix()
+
+    def end(self, material):
+        pass
+
+
+class InstancedPass:
+    """('instanced', tint) materials: mesh names of an InstancedRenderer,
+    transforms are (batch, shift)."""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def begin(self, material):
+        self.renderer.begin(material[1])
+
+    def bind(self, mesh):
+        self.renderer.bind_mesh(mesh)
+
+    def draw(self, mesh, transform):
+        self.renderer.draw_batch(*transform)
+
+    def end(self, material):
+        self.renderer.end()
+
+
+class CallPass:
+    """('call',) material: the transform is a function that draws itself
+    (objects with their own shader or per-frame geometry)."""
+
+    def begin(self, material):
+        pass
+
+    def bind(self, mesh):
+        pass
+
+    def draw(self, mesh, transform):
+        transform()
+
+    def end(self, material):
+        pass
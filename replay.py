@@ -0,0 +1,139 @@
+"""Record and replay input sessions.
+
+A session log is a small text file with one event per line:
+
+    # runner-replay 1
+    0 S 3141592653
+    212 P 100
+    530 K 32
+    530 K 32
+    1804 E
+
+Each line is `tick kind args...`, where tick is the simulation step the
+event was applied before:
+
+    S seed          GameSession.reset(seed); ticks restart at 0 after it
+    K byte          GameSession.keyboard key
+    P key           GameSession.special key (the arrows)
+    M button state  mouse click (only changes the view)
+    E               end of the session
+
+The simulation only advances in fixed TICK steps, input is only applied
+between steps and every spawner draws from a stream seeded by the S event,
+so feeding the same events before the same ticks plays the session out
+exactly.  Without --render only engine.py is loaded; camera and mouse
+events then have nothing to act on.  Record with `project.py --record LOG`, watch it again with
+`project.py --replay LOG`, or step it here without a window:
+
+    python replay.py session.log                 # as fast as possible
+    python replay.py session.log --render        # also draw every tick (EGL)
+
+The printed digest summarises the final game state; two builds that print
+the same digest simulated the same session.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+
+HEADER = "# runner-replay 1"
+KINDS = {'S': 1, 'K': 1, 'P': 1, 'M': 2, 'E': 0}   # argument count per kind
+
+
+def save_log(path, events):
+    with open(path, 'w') as f:
+        f.write(HEADER + "\n")
+        for tick, kind, *args in events:
+            f.write(" ".join(map(str, (tick, kind, *args))) + "\n")
+
+
+def load_log(path):
+    """The events in `path` as (tick, kind, *args) tuples."""
+    events = []
+    with open(path) as f:
+        if f.readline().strip() != HEADER:
+            raise ValueError(f"{path}: not a runner replay log")
+        for n, line in enumerate(f, 2):
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) < 2 or parts[1] not in KINDS or len(parts) != 2 + KINDS[parts[1]]:
+                raise ValueError(f"{path}:{n}: bad event {line.strip()!r}")
+            events.append((int(parts[0]), parts[1], *map(int, parts[2:])))
+    return events
+
+
+def run(session, events, on_tick=None):
+    """Step a GameSession through a recorded session; returns the ticks simulated.
+
+    on_tick() is called after every step (e.g. to render a frame).
+    """
+    session.replay_queue.clear()
+    session.replay_queue.extend(events)
+    ticks = 0
+    while session.replay_queue:
+        session.apply_due_inputs()
+        if not session.is_running:
+            if session.replay_queue:
+                # paused with the next event in the future: nothing can resume it
+                raise ValueError(f"replay stalls at tick {session.tick_no} "
+                                 f"(next event {session.replay_queue[0]})")
+            break
+        session.step()
+        ticks += 1
+        if on_tick:
+            on_tick()
+    return ticks
+
+
+def state_digest(st):
+    """Short hash of a GameSession's state, for comparing two replays."""
+    h = hashlib.sha1()
+    h.update(repr((st.game_seed, st.tick_no, st.points, st.lives,
+                   st.meters, st.runner_side, st.lane_idx)).encode())
+    for store in (st.coins, st.obstacles, st.magnets):
+        for col in (store.x, store.y, store.type):
+            h.update(col[:store.n].tobytes())
+    return h.hexdigest()[:16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--render', action='store_true',
+                        help='draw every tick into an offscreen EGL context')
+    args = parser.parse_args()
+
+    events = load_log(args.log)
+    on_tick = None
+    if args.render:
+        import bench
+        bench.make_context('egl')
+        import project as game
+        session = game.session
+        on_tick = lambda: game.render_frame(hud=False)
+    else:
+        from engine import GameSession
+        session = GameSession()
+
+    t0 = time.perf_counter()
+    ticks = run(session, events, on_tick)
+    took = time.perf_counter() - t0
+    if args.render:
+        game.release_gl()
+
+    print(json.dumps({
+        'events': len(events),
+        'ticks': ticks,
+        'seconds': round(took, 3),
+        'points': session.points,
+        'meters': round(session.meters, 3),
+        'lives': session.lives,
+        'digest': state_digest(session),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
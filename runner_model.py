@@ -0,0 +1,164 @@
+"""The runner character as one pre-built mesh driven by a bone palette.
+
+All body parts are tessellated once into a single vertex buffer.  Each
+vertex carries the index of the bone it follows: the static body, two arms
+or two legs.  A frame then only uploads the bone matrices (the pose) and
+issues one glDrawElements.  Day and night clothing colours are separate
+cached colour buffers.
+"""
+import math
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from OpenGL.arrays import vbo
+
+import meshes
+
+VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute float bone;
+attribute vec3 colour;
+uniform mat4 palette[5];
+varying vec3 v_colour;
+
+void main() {
+    vec4 p = palette[int(bone + 0.5)] * vec4(position, 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * p;
+    v_colour = colour;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+varying vec3 v_colour;
+
+void main() {
+    gl_FragColor = vec4(v_colour, 1.0);
+}
+"""
+
+BODY, ARM_L, ARM_R, LEG_L, LEG_R = range(5)
+
+SKIN = (1, 0.8, 0.6)
+HIP_Z = -13.5
+LEG_H = 14.0
+BASE_BIAS = -5.0
+
+# joint positions the limb bones rotate about
+JOINTS = {ARM_L: (-12, 0, 10), ARM_R: (12, 0, 10), LEG_L: (-5, 0, HIP_Z), LEG_R: (5, 0, HIP_Z)}
+
+
+def runner_parts():
+    """(mesh, bone, day colour, night colour) for every body part, in the
+    runner's local frame (limbs relative to their joint)."""
+    shirt = ((0, 0.5, 1), (0.4, 0.4, 0.4))
+    pants = ((0.2, 0.2, 0.8), (0.1, 0.1, 0.1))
+    foot_z = HIP_Z - LEG_H - 1.0
+    arm = meshes.cylinder(2, 2, 12, 8, 8).transformed(rot_x=90)
+    leg = meshes.cylinder(3, 3, LEG_H, 8, 8).transformed(rot_x=180)
+    foot = meshes.cube(6)
+    return [
+        (meshes.cube(15).transformed(scale=(1.2, 0.8, 1.8)), BODY) + shirt,
+        (meshes.sphere(8, 10, 10).transformed(offset=(0, 0, 18)), BODY, SKIN, SKIN),
+        (meshes.sphere(8.5, 8, 8).transformed(offset=(0, 0, 25)), BODY, (0.3, 0.2, 0.1), (0.3, 0.2, 0.1)),
+        (arm, ARM_L, SKIN, SKIN),
+        (arm, ARM_R, SKIN, SKIN),
+        (leg, LEG_L) + pants,
+        (leg, LEG_R) + pants,
+        (foot.transformed(scale=(0.8, 1.2, 0.4), offset=(-5, 2, foot_z)), BODY, (0.1,) * 3, (0.1,) * 3),
+        (foot.transformed(scale=(0.8, 1.2, 0.4), offset=(5, 2, foot_z)), BODY, (0.1,) * 3, (0.1,) * 3),
+    ]
+
+
+def limb_matrix(joint, angle):
+    """Row-major 4x4: rotate `angle` degrees about X, then move to `joint`."""
+    a = math.radians(angle)
+    c, s = math.cos(a), math.sin(a)
+    x, y, z = joint
+    return [[1, 0, 0, x],
+            [0, c, -s, y],
+            [0, s, c, z],
+            [0, 0, 0, 1]]
+
+
+def limb_angles(leg_stride, arm_swing):
+    return {ARM_L: BASE_BIAS + arm_swing, ARM_R: BASE_BIAS - arm_swing,
+            LEG_L: leg_stride, LEG_R: -leg_stride}
+
+
+class RunnerModel:
+
+    def __init__(self):
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+        )
+        self.loc = {name: glGetAttribLocation(self.program, name)
+                    for name in ('position', 'bone', 'colour')}
+        self.palette_loc = glGetUniformLocation(self.program, 'palette')
+        self.palette = np.tile(np.eye(4, dtype=np.float32), (5, 1, 1))
+
+        geometry, day, night, indices = [], [], [], []
+        base = 0
+        for mesh, bone, day_rgb, night_rgb in runner_parts():
+            n = len(mesh.vertices)
+            geometry.append(np.column_stack([mesh.vertices, np.full(n, bone)]))
+            day.append(np.tile(day_rgb, (n, 1)))
+            night.append(np.tile(night_rgb, (n, 1)))
+            indices.append(mesh.indices + base)
+            base += n
+        self.geometry = vbo.VBO(np.concatenate(geometry).astype(np.float32), usage=GL_STATIC_DRAW)
+        self.colours = {
+            True: vbo.VBO(np.concatenate(day).astype(np.float32), usage=GL_STATIC_DRAW),
+            False: vbo.VBO(np.concatenate(night).astype(np.float32), usage=GL_STATIC_DRAW),
+        }
+        idx = np.concatenate(indices).astype(np.uint32)
+        self.indices = vbo.VBO(idx, usage=GL_STATIC_DRAW, target=GL_ELEMENT_ARRAY_BUFFER)
+        self.count = len(idx)
+
+    @classmethod
+    def create(cls):
+        """A model for the current context, or None if shaders aren't available."""
+        try:
+            return cls()
+        except Exception as e:
+            print(f"Runner model unavailable, using immediate mode: {e}")
+            return None
+
+    def pose(self, leg_stride, arm_swing):
+        for bone, angle in limb_angles(leg_stride, arm_swing).items():
+            self.palette[bone] = limb_matrix(JOINTS[bone], angle)
+
+    def draw(self, is_day):
+        loc = self.loc
+        glUseProgram(self.program)
+        glUniformMatrix4fv(self.palette_loc, 5, GL_TRUE, self.palette)
+
+        self.geometry.bind()
+        glEnableVertexAttribArray(loc['position'])
+        glVertexAttribPointer(loc['position'], 3, GL_FLOAT, GL_FALSE, 16, self.geometry)
+        glEnableVertexAttribArray(loc['bone'])
+        glVertexAttribPointer(loc['bone'], 1, GL_FLOAT, GL_FALSE, 16, self.geometry + 12)
+
+        colours = self.colours[bool(is_day)]
+        colours.bind()
+        glEnableVertexAttribArray(loc['colour'])
+        glVertexAttribPointer(loc['colour'], 3, GL_FLOAT, GL_FALSE, 12, colours)
+
+        self.indices.bind()
+        glDrawElements(GL_TRIANGLES, self.count, GL_UNSIGNED_INT, None)
+        self.indices.unbind()
+
+        for name in ('position', 'bone', 'colour'):
+            glDisableVertexAttribArray(loc[name])
+        colours.unbind()
+        glUseProgram(0)
+
+    def release(self):
+        self.geometry.delete()
+        self.indices.delete()
+        for buf in self.colours.values():
+            buf.delete()
+        glDeleteProgram(self.program)
@@ -0,0 +1,147 @@
+"""Running the simulation on its own thread.
+
+SimThread steps a GameSession at a fixed TICK rate on a worker thread and
+publishes what the renderer needs after each batch of steps as a
+RenderFrame.  Frames pass through a FrameBuffer of three: the simulation
+fills the back one while the renderer draws the front one and the newest
+finished one waits in the middle, so neither side ever waits for the other
+or sees a frame change while it is in use.
+
+Everything that touches the session (input, resets) goes through call(),
+which runs it on the simulation thread between two steps.  The thread
+sleeps on that call queue, so input is applied within a tick however long
+frames take to draw, and GL calls (which release the GIL) overlap the
+entity updates.
+"""
+import queue
+import threading
+import time
+
+from chunks import ChunkRing
+from entities import EntityStore
+
+
+class RenderFrame:
+    """The part of a GameSession the renderer reads, as of one tick.
+
+    time is the perf_counter() time that tick was due; the renderer
+    interpolates from prev_* towards the current values as the wall clock
+    moves past it.
+    """
+
+    VALUES = (
+        'runner_forward', 'runner_side', 'prev_runner_side',
+        'track_scroll', 'prev_track_scroll', 'last_move', 'anim_curr',
+        'is_day', 'is_running', 'paused',
+        'meters', 'points', 'lives', 'mag_on', 'mag_time_left', 'tick_no',
+    )
+    PARTS = ('coins', 'obstacles', 'magnets', 'track_chunks')
+    __slots__ = VALUES + PARTS + ('bg_rgb', 'time')
+
+    def __init__(self, ring):
+        for name in self.VALUES:
+            setattr(self, name, None)
+        self.coins = EntityStore()
+        self.obstacles = EntityStore()
+        self.magnets = EntityStore()
+        self.track_chunks = ChunkRing(ring.length, ring.ahead, -ring.origin, ring.trees.shape[1])
+        self.bg_rgb = ()
+        self.time = 0.0
+
+    def fill(self, session, t):
+        for name in self.VALUES:
+            setattr(self, name, getattr(session, name))
+        for name in self.PARTS:
+            getattr(self, name).restore(getattr(session, name).snapshot())
+        self.bg_rgb = tuple(session.bg_rgb)
+        self.time = t
+
+
+class FrameBuffer:
+    """Triple-buffered RenderFrames: publish() on one thread, latest() on another."""
+
+    def __init__(self, ring):
+        self.back, self.middle, self.front = (RenderFrame(ring) for _ in range(3))
+        self.fresh = False               # middle is newer than front
+        self.lock = threading.Lock()
+
+    def publish(self, session, t):
+        frame = self.back
+        frame.fill(session, t)
+        with self.lock:
+            self.back, self.middle = self.middle, frame
+            self.fresh = True
+
+    def latest(self):
+        """The newest published frame; it stays as it is until the next call."""
+        with self.lock:
+            if self.fresh:
+                self.front, self.middle = self.middle, self.front
+                self.fresh = False
+        return self.front
+
+
+class SimThread:
+    """Steps `session` every `tick` seconds on a worker thread.
+
+    At most max_steps ticks are run to catch up at a time; beyond that a
+    stalled thread drops time, like the windowed game's frame loop.
+    """
+
+    def __init__(self, session, tick, max_steps=8):
+        self.session = session
+        self.tick = tick
+        self.max_steps = max_steps
+        self.frames = FrameBuffer(session.track_chunks)
+        self.calls = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='simulation', daemon=True)
+
+    def start(self):
+        self.frames.publish(self.session, time.perf_counter())
+        self.thread.start()
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the simulation thread before its next step."""
+        self.calls.put((fn, args))
+
+    def _run(self):
+        s = self.session
+        due = time.perf_counter() + self.tick
+        while True:
+            try:
+                item = self.calls.get(timeout=max(due - time.perf_counter(), 0.0))
+            except queue.Empty:
+                item = ()
+            changed = False
+            while item is not None:
+                if item:
+                    fn, args = item
+                    fn(*args)
+                    changed = True
+                try:
+                    item = self.calls.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                return
+
+            steps = 0
+            now = time.perf_counter()
+            while due <= now:
+                if s.replay_queue:
+                    s.apply_due_inputs()
+                if s.is_running:
+                    s.step(self.tick)
+                    changed = True
+                due += self.tick
+                steps += 1
+                if steps == self.max_steps:
+                    due = now + self.tick
+                    break
+            if changed:
+                self.frames.publish(s, due - self.tick)
+
+    def stop(self, timeout=1.0):
+        if self.thread.is_alive():
+            self.calls.put(None)
+            self.thread.join(timeout)
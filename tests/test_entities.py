@@ -0,0 +1,66 @@
+"""MagnetField.solve()'s array path and its per-row path agree."""
+import random
+
+import numpy as np
+import pytest
+
+import entities
+from entities import EntityStore, MagnetField
+
+VALUES = np.array([1, 2])
+
+
+def make_store(rng, n):
+    store = EntityStore(capacity=8)
+    for _ in range(n):
+        store.add(rng.choice((-100.0, 0.0, 100.0)) + rng.uniform(-5, 5),
+                  rng.uniform(-100, 600), rng.uniform(10, 30), rng.randint(0, 1))
+    store.kill(rng.sample(range(n), n // 10))      # some rows already dead
+    return store
+
+
+def make_field(rng, attractors):
+    field = MagnetField()
+    for _ in range(attractors):
+        field.add(rng.uniform(-100, 100), rng.uniform(0, 400), 20,
+                  rng.uniform(100, 500), rng.uniform(5, 20), rng.uniform(20, 80))
+    return field
+
+
+def columns(store):
+    return {c: getattr(store, c)[:store.n].tolist() for c in store.COLUMNS}, store.dead
+
+
+@pytest.mark.parametrize('attractors', [2, 3, 5])
+@pytest.mark.parametrize('n', [5, 23, 40, 150])
+def test_array_and_row_paths_agree(monkeypatch, n, attractors):
+    rng = random.Random(n * 10 + attractors)
+    picked = moved = 0
+    for _ in range(20):
+        store = make_store(rng, n)
+        field = make_field(rng, attractors)
+        snap = store.snapshot()
+
+        with monkeypatch.context() as m:
+            m.setattr(entities, 'SMALL_N', 0)      # always the array path
+            by_array = field.solve(store, VALUES)
+        after_array = columns(store)
+        moved += after_array[0]['y'] != snap[2 + store.COLUMNS.index('y')].tolist()
+
+        store.restore(snap)
+        by_rows = field._solve_rows(store, VALUES)
+        assert by_rows == by_array
+        assert columns(store) == after_array
+        picked += by_rows[0]
+    # both kinds of outcome were compared
+    assert picked and moved
+
+
+def test_nearest_field_pulls():
+    store = EntityStore()
+    store.add(0.0, 100.0, 20.0)
+    field = MagnetField()
+    field.add(0, 0, 20, 500, 10, 1)       # 100 away
+    field.add(0, 150, 20, 500, 10, 1)     # 50 away: this one pulls
+    assert field.solve(store, VALUES) == (0, 0)
+    assert store.y[0] == 110.0
@@ -0,0 +1,58 @@
+"""GameState.snapshot()/restore() rewind a GameSession exactly."""
+import engine
+from gamestate import GameState
+
+
+def play(session, ticks):
+    for _ in range(ticks):
+        if session.tick_no % 40 == 0:
+            # weave between the lanes so there are hits, pickups and switches
+            session.special(engine.KEY_LEFT if session.tick_no % 120 else engine.KEY_RIGHT)
+        session.step()
+
+
+def state_of(session):
+    """Everything a GameState holds, as plain comparable values."""
+    values = {name: getattr(session, name) for name in GameState.VALUES}
+    stores = {name: {col: getattr(store, col)[:store.n].tolist() for col in store.COLUMNS}
+              for name in ('coins', 'obstacles', 'magnets')
+              for store in [getattr(session, name)]}
+    ring = session.track_chunks
+    # ring.ids are left out: ids handed out before a restore stay used up
+    chunks = (ring.trees.tolist(), ring.numbers.tolist(), ring.next)
+    rngs = {name: getattr(session, name).getstate() for name in GameState.RNGS}
+    lists = {name: list(getattr(session, name)) for name in GameState.LISTS}
+    return values, stores, chunks, session.lane_occ.snapshot(), rngs, lists
+
+
+def test_restore_replays_identically():
+    session = engine.GameSession()
+    session.reset(9)
+    session.mag_on, session.mag_time_left = True, 20.0  # magnet pulls too
+    play(session, 300)
+    snap = session.snapshot()
+    points, lives, chunk = session.points, session.lives, session.track_chunks.next
+
+    play(session, 900)
+    after = state_of(session)
+    # the stretch replayed has pickups, a hit and new chunks in it
+    assert session.is_running and session.tick_no == 1200
+    assert session.points > points and session.lives < lives
+    assert session.track_chunks.next > chunk
+
+    session.restore(snap)
+    assert session.tick_no == 300
+    play(session, 900)
+    assert state_of(session) == after
+
+
+def test_snapshot_restores_more_than_once():
+    session = engine.GameSession()
+    session.reset(11)
+    play(session, 100)
+    snap = session.snapshot()
+    before = state_of(session)
+    for _ in range(3):
+        play(session, 150)
+        session.restore(snap)
+        assert state_of(session) == before
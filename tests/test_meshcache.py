@@ -0,0 +1,92 @@
+"""MeshCache's allocate/release accounting, with the GL calls faked."""
+import pytest
+
+import meshcache
+
+
+class FakeGL:
+    """Stands in for the GL/GLU entry points MeshCache calls."""
+
+    def __init__(self):
+        self.next_list = 1
+        self.lists = set()               # display lists not yet deleted
+        self.quadrics = 0
+        self.compiling = 0               # GL_LIST_INDEX
+
+    def glGenLists(self, n):
+        lst = self.next_list
+        self.next_list += n
+        self.lists.update(range(lst, lst + n))
+        return lst
+
+    def glDeleteLists(self, lst, n):
+        for i in range(lst, lst + n):
+            self.lists.remove(i)
+
+    def glNewList(self, lst, mode):
+        self.compiling = lst
+
+    def glEndList(self):
+        self.compiling = 0
+
+    def glGetIntegerv(self, name):
+        return self.compiling
+
+    def gluNewQuadric(self):
+        self.quadrics += 1
+        return object()
+
+    def gluDeleteQuadric(self, quadric):
+        self.quadrics -= 1
+
+
+@pytest.fixture
+def gl(monkeypatch):
+    fake = FakeGL()
+    for name in ('glGenLists', 'glDeleteLists', 'glNewList', 'glEndList', 'glGetIntegerv',
+                 'gluNewQuadric', 'gluDeleteQuadric'):
+        monkeypatch.setattr(meshcache, name, getattr(fake, name))
+    for name in ('glCallList', 'gluSphere', 'gluCylinder', 'glBegin', 'glVertex3f', 'glEnd'):
+        monkeypatch.setattr(meshcache, name, lambda *args: None)
+    return fake
+
+
+def test_each_mesh_is_built_once(gl):
+    cache = meshcache.MeshCache()
+    for _ in range(3):
+        cache.sphere(5, 12, 12)
+        cache.cylinder(2, 2, 10, 8, 1)
+        cache.cube(4)
+    cache.sphere_list(5, 12, 12)
+    # three display lists and the shared quadric
+    assert cache.allocated == 4
+    assert cache.freed == 0
+    assert cache.live == 4
+    assert len(gl.lists) == 3 and gl.quadrics == 1
+
+
+def test_release_frees_everything(gl):
+    cache = meshcache.MeshCache()
+    cache.sphere(5, 12, 12)
+    cache.sphere(5, 6, 6)
+    cache.cube(4)
+    cache.release()
+    assert cache.live == 0
+    assert cache.freed == cache.allocated == 4
+    assert not gl.lists and gl.quadrics == 0
+
+    # the cache can be used again after a release, and counts on
+    cache.cube(4)
+    assert cache.allocated == 5 and cache.live == 1
+    cache.release()
+    assert cache.live == 0 and not gl.lists
+
+
+def test_no_list_inside_another_compile(gl):
+    cache = meshcache.MeshCache()
+    gl.compiling = 99                    # someone else's glNewList is open
+    cache.cube(4)
+    assert cache.allocated == 0 and not cache.lists
+    gl.compiling = 0
+    cache.cube(4)
+    assert cache.allocated == 1
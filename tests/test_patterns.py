@@ -0,0 +1,27 @@
+"""Every obstacle row the pattern tables offer can be got through."""
+from patterns import ALL, LANES, MASK_LANES, OB_PATTERNS, FREE_LANES
+
+
+def test_rows_leave_a_reachable_lane():
+    for k, table in enumerate(OB_PATTERNS):
+        for last in range(ALL + 1):
+            free_before = MASK_LANES[ALL & ~last]
+            for blocked in range(ALL + 1):
+                for row in table[last][blocked]:
+                    assert row != ALL
+                    assert len(MASK_LANES[row]) == k + 1
+                    assert not row & blocked
+                    free_now = MASK_LANES[ALL & ~row]
+                    # the runner can stay put or step one lane across
+                    assert any(abs(i - j) <= 1 for i in free_before for j in free_now), \
+                        (k, last, blocked, row)
+
+
+def test_every_row_is_offered_on_an_open_track():
+    for k, table in enumerate(OB_PATTERNS):
+        assert len(table[0][0]) == sum(1 for m in range(1, ALL) if len(MASK_LANES[m]) == k + 1)
+
+
+def test_free_lanes():
+    for blocked in range(ALL + 1):
+        assert FREE_LANES[blocked] == tuple(i for i in range(LANES) if not blocked >> i & 1)
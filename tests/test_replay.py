@@ -0,0 +1,57 @@
+"""A recorded session replays to the same final state."""
+import engine
+import replay
+
+
+def press(session, kind, key):
+    # what project.py's GLUT adapters do: record, then act
+    session.record_input(kind, key)
+    if kind == 'K':
+        session.keyboard(bytes([key]))
+    else:
+        session.special(key)
+
+
+def record(path, seed, ticks):
+    session = engine.GameSession()
+    session.input_log = []
+    session.reset(seed)
+    for t in range(ticks):
+        if t % 45 == 0:
+            press(session, 'P', engine.KEY_LEFT if t % 135 else engine.KEY_RIGHT)
+        if t == 200:
+            press(session, 'K', ord('d'))            # day/night transition
+        if t == 400:
+            press(session, 'K', ord(' '))            # pause and resume on the same tick
+            press(session, 'K', ord(' '))
+        if not session.is_running:
+            break
+        session.step()
+    session.input_log.append((session.tick_no, 'E'))
+    replay.save_log(path, session.input_log)
+    return session
+
+
+def test_replay_matches_recording(tmp_path):
+    path = tmp_path / 'session.log'
+    live = record(path, seed=5, ticks=1500)
+    assert live.tick_no > 400
+
+    events = replay.load_log(path)
+    assert events[0] == (0, 'S', 5)
+    session = engine.GameSession()
+    ticks = replay.run(session, events)
+    assert ticks == live.tick_no
+    assert replay.state_digest(session) == replay.state_digest(live)
+
+
+def test_replays_agree(tmp_path):
+    path = tmp_path / 'session.log'
+    record(path, seed=12, ticks=800)
+    events = replay.load_log(path)
+    digests = set()
+    for _ in range(2):
+        session = engine.GameSession()
+        replay.run(session, events)
+        digests.add(replay.state_digest(session))
+    assert len(digests) == 1
@@ -0,0 +1,24 @@
+"""Headless simulation stays fast enough for balance sweeps.
+
+The floor is well under what a developer machine manages (over 100k
+ticks/s on CPython 3.11) so the test only trips on a real regression,
+such as per-tick array work coming back for stores of a few rows.
+"""
+import time
+
+import engine
+
+MIN_TICKS_PER_SECOND = 40000
+
+
+def test_headless_throughput(monkeypatch):
+    monkeypatch.setattr(engine, 'hit_radius', 0)      # never game over
+    session = engine.GameSession()
+    session.run(1000, seed=1)                         # warm up
+    best = 0.0
+    for _ in range(3):
+        t0 = time.perf_counter()
+        result = session.run(20000, seed=1)
+        best = max(best, result['ticks'] / (time.perf_counter() - t0))
+    assert result['ticks'] == 20000
+    assert best > MIN_TICKS_PER_SECOND, f"{best:.0f} ticks/s"